@@ -1,10 +1,12 @@
 from fastapi import APIRouter, HTTPException, status
 from app.models.auth import LoginRequest, TokenResponse
 from app.services.auth_service import auth_service
-from app.core.config import settings
+from app.core.config import get_settings
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
+_INVALID_RESP = {"valid": False}
+
 @router.post("/login", response_model=TokenResponse)
 async def login(request: LoginRequest):
     """
@@ -22,7 +24,7 @@ async def login(request: LoginRequest):
     return TokenResponse(
         access_token=access_token,
         token_type="bearer",
-        expires_in=settings.access_token_expire_minutes
+        expires_in=get_settings().access_token_expire_minutes
     )
 
 @router.post("/verify")
@@ -30,12 +32,12 @@ async def verify_token(token: str):
     """
     Verify if a token is valid
     """
-    try:
-        payload = auth_service.verify_token(token)
-        return {
-            "valid": True,
-            "user": payload.get("sub"),
-            "expires": payload.get("exp")
-        }
-    except HTTPException:
-        return {"valid": False}
+    payload = auth_service.try_verify_token(token)
+    if payload is None:
+        return _INVALID_RESP
+    
+    return {
+        "valid": True,
+        "user": payload.get("sub"),
+        "expires": payload.get("exp")
+    }
@@ -1,19 +1,122 @@
-from fastapi import APIRouter, HTTPException, Depends
-from app.models.expense import ExpenseInput, ExpenseResponse, AnalyticsRequest, AnalyticsResponse, ParsedExpense
+import asyncio
+import logging
+import uuid
+from datetime import datetime, date
+from typing import Optional
+from cachetools import TTLCache
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi.responses import Response, StreamingResponse
+from app.models.expense import ExpenseInput, BulkExpenseInput, ExpenseResponse, AnalyticsRequest, AnalyticsBatchRequest, AnalyticsResponse, ParsedExpense
 from app.services.ai_service import GoogleAIService
 from app.services.sheets_service import GoogleSheetsService
 from app.services.analytics_service import AnalyticsService
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_ai_service, get_sheets_service, get_analytics_service
+from app.core.responses import ORJSONResponse, dumps
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1", tags=["expenses"])
 
-# Initialize services
-ai_service = GoogleAIService()
-sheets_service = GoogleSheetsService()
-analytics_service = AnalyticsService()
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    """Parse a start/end date query parameter, which may also be a full ISO datetime"""
+    if not value:
+        return None
+    try:
+        # Plain YYYY-MM-DD dates, the usual form, parse without building a datetime
+        return date.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid date: {value}"
+        )
+
+# Response templates for the plain-dict endpoints, copied and filled per request
+_TOTAL_SKELETON = {"success": True, "user_id": None, "total_spending": None, "period": None}
+_CATEGORY_SKELETON = {"success": True, "user_id": None, "category_breakdown": None, "total": None, "period": None}
+_SEARCH_SKELETON = {"success": True, "query": None, "count": None, "results": None}
+
+# Short-lived cache for the aggregation endpoints, keyed by (kind, user_id, start_date, end_date)
+_agg_cache = TTLCache(maxsize=2048, ttl=60)
+
+def _invalidate_aggregates(*user_ids: str):
+    """Drop cached aggregations for the given users after their expenses change"""
+    for key in [key for key in list(_agg_cache.keys()) if key[1] in user_ids]:
+        _agg_cache.pop(key, None)
+    AnalyticsService.invalidate(*user_ids)
 
-@router.post("/expenses", response_model=ExpenseResponse)
-async def add_expense(expense_input: ExpenseInput, current_user: str = Depends(get_current_user)):
+# Most analytics queries answered in one batch request
+ANALYTICS_BATCH_LIMIT = 10
+
+def _analytics_payload(result: dict) -> dict:
+    """Analytics response body (the AnalyticsResponse shape) for an answer_query result"""
+    return {
+        "success": True,
+        "message": result["message"],
+        "data": result["data"],
+        "visualization": result["visualization"],
+        "visualization_format": result["visualization_format"],
+        "visualization_url": result["visualization_url"],
+        "query": result["query"],
+        "start_date": result["start_date"],
+        "end_date": result["end_date"],
+    }
+
+# Bulk requests with more texts than this are parsed through the Gemini Batch API in the background
+BULK_INTERACTIVE_LIMIT = 20
+
+# Status of background bulk jobs by job id, polled through GET /expenses/bulk/{job_id}
+_bulk_jobs = TTLCache(maxsize=1024, ttl=24 * 60 * 60)
+
+async def _save_batch_parsed(
+    job_id: str,
+    texts: list,
+    user_id: str,
+    ai_service: GoogleAIService,
+    sheets_service: GoogleSheetsService
+):
+    """
+    Background task: save the texts that parse locally straight away, then parse the rest
+    with a Gemini batch job and save those, recording progress under job_id
+    """
+    job = _bulk_jobs[job_id]
+    unsaved = list(texts)
+    try:
+        quick = ai_service.quick_parse_texts(texts)
+        local = [expense.model_copy(update={"user_id": user_id}) for expense in quick if expense is not None]
+        if local:
+            await sheets_service.bulk_import(local)
+            _invalidate_aggregates(user_id)
+            job["saved"] += len(local)
+            logger.info("Saved %d locally parsed expenses for bulk job %s", len(local), job_id)
+        
+        unsaved = [text for text, expense in zip(texts, quick) if expense is None]
+        if unsaved:
+            job["status"] = "parsing"
+            expenses = await ai_service.parse_expense_texts_batch(unsaved)
+            await sheets_service.bulk_import([
+                expense.model_copy(update={"user_id": user_id}) for expense in expenses
+            ])
+            _invalidate_aggregates(user_id)
+            job["saved"] += len(expenses)
+            unsaved = []
+        
+        job["status"] = "completed"
+        logger.info("Bulk job %s saved %d expenses for %s", job_id, job["saved"], user_id)
+    except Exception as e:
+        logger.exception("Bulk job %s failed after saving %d of %d expenses", job_id, job["saved"], len(texts))
+        # The texts not yet saved go back to the client to resubmit
+        job.update(status="failed", error=str(e), unsaved_texts=unsaved)
+
+@router.post("/expenses", response_class=ORJSONResponse, response_model=None, responses={200: {"model": ExpenseResponse}})
+async def add_expense(
+    expense_input: ExpenseInput,
+    ai_service: GoogleAIService = Depends(get_ai_service),
+    sheets_service: GoogleSheetsService = Depends(get_sheets_service)
+):
     """
     Parse natural language expense text and save to Google Sheets
     
@@ -22,17 +125,19 @@ async def add_expense(expense_input: ExpenseInput, current_user: str = Depends(g
     try:
         # Parse the expense using AI
         parsed_expense = await ai_service.parse_expense_text(expense_input.text)
-        parsed_expense.user_id = expense_input.user_id
+        parsed_expense = parsed_expense.model_copy(update={"user_id": expense_input.user_id})
         
         # Save to Google Sheets
         row_number = await sheets_service.add_expense(parsed_expense)
+        _invalidate_aggregates(parsed_expense.user_id)
         
-        return ExpenseResponse(
-            success=True,
-            message=f"Expense successfully recorded in row {row_number}",
-            expense=parsed_expense,
-            row_number=row_number
-        )
+        # The expense was validated when parsed, so it goes straight to orjson (the ExpenseResponse shape)
+        return ORJSONResponse({
+            "success": True,
+            "message": f"Expense successfully recorded in row {row_number}",
+            "expense": parsed_expense.model_dump(),
+            "row_number": row_number
+        })
         
     except Exception as e:
         raise HTTPException(
@@ -40,8 +145,77 @@ async def add_expense(expense_input: ExpenseInput, current_user: str = Depends(g
             detail=f"Failed to process expense: {str(e)}"
         )
 
-@router.post("/analytics", response_model=AnalyticsResponse)
-async def get_analytics(request: AnalyticsRequest, current_user: str = Depends(get_current_user)):
+@router.post("/expenses/bulk")
+async def add_expenses_bulk(
+    bulk_input: BulkExpenseInput,
+    background_tasks: BackgroundTasks,
+    ai_service: GoogleAIService = Depends(get_ai_service),
+    sheets_service: GoogleSheetsService = Depends(get_sheets_service)
+):
+    """
+    Parse and save many expense texts at once
+    
+    Up to 20 texts are parsed and saved immediately. Larger requests, or ones with
+    background=true, are queued as a discounted Gemini batch job and saved when it completes.
+    """
+    try:
+        count = len(bulk_input.texts)
+        
+        if bulk_input.background or count > BULK_INTERACTIVE_LIMIT:
+            job_id = uuid.uuid4().hex
+            _bulk_jobs[job_id] = {"job_id": job_id, "status": "queued", "total": count, "saved": 0}
+            background_tasks.add_task(
+                _save_batch_parsed, job_id, bulk_input.texts, bulk_input.user_id, ai_service, sheets_service
+            )
+            # Accepted, not yet saved: the client polls the job for the outcome
+            return ORJSONResponse({
+                "status": "queued",
+                "message": f"{count} expenses queued for batch parsing",
+                "queued": count,
+                "job_id": job_id,
+                "status_url": f"/api/v1/expenses/bulk/{job_id}"
+            }, status_code=202)
+        
+        parsed_expenses = await asyncio.gather(*(
+            ai_service.parse_expense_text(text) for text in bulk_input.texts
+        ))
+        parsed_expenses = [
+            expense.model_copy(update={"user_id": bulk_input.user_id}) for expense in parsed_expenses
+        ]
+        row_numbers = await sheets_service.add_expenses(parsed_expenses)
+        _invalidate_aggregates(bulk_input.user_id)
+        
+        return {
+            "success": True,
+            "message": f"{count} expenses successfully recorded",
+            "expenses": [
+                {"expense": expense, "row_number": row_number}
+                for expense, row_number in zip(parsed_expenses, row_numbers)
+            ]
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to process expenses: {str(e)}"
+        )
+
+@router.get("/expenses/bulk/{job_id}", response_class=ORJSONResponse, response_model=None)
+async def get_bulk_job(job_id: str):
+    """
+    Status of a background bulk job: queued, parsing, completed or failed, with the number
+    of expenses saved so far. Failed jobs list the texts that weren't saved.
+    """
+    job = _bulk_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Bulk job not found or expired")
+    return ORJSONResponse(job)
+
+@router.post("/analytics", response_class=ORJSONResponse, response_model=None, responses={200: {"model": AnalyticsResponse}})
+async def get_analytics(
+    request: AnalyticsRequest,
+    analytics_service: AnalyticsService = Depends(get_analytics_service)
+):
     """
     Answer questions about spending patterns
     
@@ -53,18 +227,46 @@ async def get_analytics(request: AnalyticsRequest, current_user: str = Depends(g
     try:
         result = await analytics_service.answer_query(
             request.query, 
-            request.user_id
+            request.user_id,
+            request.visualization_format
         )
         
-        return AnalyticsResponse(
-            success=True,
-            message=result["message"],
-            data=result["data"],
-            visualization=result["visualization"],
-            query=result["query"],
-            start_date=result["start_date"],
-            end_date=result["end_date"],
+        # Large breakdowns and inline PNGs go straight to orjson, skipping model validation
+        return ORJSONResponse(_analytics_payload(result))
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate analytics: {str(e)}"
         )
+
+@router.post("/analytics/batch", response_class=ORJSONResponse, response_model=None)
+async def get_analytics_batch(
+    request: AnalyticsBatchRequest,
+    analytics_service: AnalyticsService = Depends(get_analytics_service)
+):
+    """
+    Answer several spending questions at once, e.g. for a dashboard
+    
+    Queries run concurrently; results come back in the same order as the queries.
+    """
+    if len(request.queries) > ANALYTICS_BATCH_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {ANALYTICS_BATCH_LIMIT} queries per batch"
+        )
+    
+    try:
+        results = await analytics_service.answer_queries(
+            request.queries,
+            request.user_id,
+            request.visualization_format
+        )
+        
+        return ORJSONResponse({
+            "success": True,
+            "results": [_analytics_payload(result) for result in results]
+        })
         
     except Exception as e:
         raise HTTPException(
@@ -72,134 +274,175 @@ async def get_analytics(request: AnalyticsRequest, current_user: str = Depends(g
             detail=f"Failed to generate analytics: {str(e)}"
         )
 
+@router.get("/viz/{visualization_id}", response_class=Response, responses={200: {"content": {"image/png": {}}}})
+async def get_visualization(
+    visualization_id: str,
+    analytics_service: AnalyticsService = Depends(get_analytics_service)
+):
+    """
+    Fetch a chart image linked from an analytics response (visualization_format="png_url")
+    """
+    png = analytics_service.get_visualization(visualization_id)
+    if png is None:
+        raise HTTPException(status_code=404, detail="Visualization not found or expired")
+    return Response(content=png, media_type="image/png")
+
 @router.get("/expenses/{user_id}")
 async def get_user_expenses(
     user_id: str,
-    current_user: str = Depends(get_current_user),
     start_date: str = None,
     end_date: str = None,
-    category: str = None
+    category: str = None,
+    sheets_service: GoogleSheetsService = Depends(get_sheets_service)
 ):
     """
     Get all expenses for a user with optional filtering
+    
+    The expense list is streamed as it is read from the sheet, with the count appended last.
     """
     try:
-        from datetime import datetime
-        
         # Parse dates if provided
-        start_date_obj = datetime.fromisoformat(start_date).date() if start_date else None
-        end_date_obj = datetime.fromisoformat(end_date).date() if end_date else None
+        start_date_obj = _parse_date(start_date)
+        end_date_obj = _parse_date(end_date)
         
-        expenses = await sheets_service.get_expenses(
+        expenses = sheets_service.stream_expenses(
             user_id=user_id,
             start_date=start_date_obj,
             end_date=end_date_obj,
             category=category
         )
-        
-        return {
-            "success": True,
-            "count": len(expenses),
-            "expenses": expenses
-        }
-        
+        # Read up to the first match before any bytes go out, so a failing Sheets read
+        # still gets a 500 rather than a 200 with an empty list
+        first = await anext(expenses, None)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to retrieve expenses: {str(e)}"
         )
+    
+    async def stream():
+        yield b'{"success":true,"expenses":['
+        if first is None:
+            yield b'],"count":0}'
+            return
+        
+        count = 1
+        yield dumps(first)
+        try:
+            async for expense in expenses:
+                yield b',' + dumps(expense)
+                count += 1
+        except Exception:
+            # The 200 status is already sent; re-raise so the connection is aborted
+            # and the client sees a failed read, not a complete but truncated list
+            logger.exception("Error streaming expenses for %s after %d record(s)", user_id, count)
+            raise
+        yield b'],"count":' + str(count).encode() + b'}'
+    
+    return StreamingResponse(stream(), media_type="application/json")
 
-@router.get("/spending/total/{user_id}")
+@router.get("/spending/total/{user_id}", response_class=ORJSONResponse, response_model=None)
 async def get_total_spending(
     user_id: str,
-    current_user: str = Depends(get_current_user),
     start_date: str = None,
-    end_date: str = None
+    end_date: str = None,
+    nocache: bool = False,
+    sheets_service: GoogleSheetsService = Depends(get_sheets_service)
 ):
     """
     Get total spending for a user
     """
     try:
-        from datetime import datetime
-        
-        start_date_obj = datetime.fromisoformat(start_date).date() if start_date else None
-        end_date_obj = datetime.fromisoformat(end_date).date() if end_date else None
+        key = ("total", user_id, start_date, end_date)
+        total = None if nocache else _agg_cache.get(key)
+        
+        if total is None:
+            start_date_obj = _parse_date(start_date)
+            end_date_obj = _parse_date(end_date)
+            
+            total = await sheets_service.get_total_spending(
+                user_id=user_id,
+                start_date=start_date_obj,
+                end_date=end_date_obj
+            )
+            _agg_cache[key] = total
         
-        total = await sheets_service.get_total_spending(
-            user_id=user_id,
-            start_date=start_date_obj,
-            end_date=end_date_obj
-        )
-        
-        return {
-            "success": True,
-            "user_id": user_id,
-            "total_spending": total,
-            "period": {
-                "start_date": start_date,
-                "end_date": end_date
-            }
-        }
+        response = _TOTAL_SKELETON.copy()
+        response["user_id"] = user_id
+        response["total_spending"] = total
+        response["period"] = {"start_date": start_date, "end_date": end_date}
+        return ORJSONResponse(response)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to calculate total spending: {str(e)}"
         )
 
-@router.get("/spending/category/{user_id}")
+@router.get("/spending/category/{user_id}", response_class=ORJSONResponse, response_model=None)
 async def get_spending_by_category(
     user_id: str,
-    current_user: str = Depends(get_current_user),
     start_date: str = None,
-    end_date: str = None
+    end_date: str = None,
+    nocache: bool = False,
+    sheets_service: GoogleSheetsService = Depends(get_sheets_service)
 ):
     """
     Get spending breakdown by category
     """
     try:
-        from datetime import datetime
+        key = ("category", user_id, start_date, end_date)
+        cached = None if nocache else _agg_cache.get(key)
+        
+        if cached is None:
+            start_date_obj = _parse_date(start_date)
+            end_date_obj = _parse_date(end_date)
+            
+            cached = await sheets_service.get_spending_by_category(
+                user_id=user_id,
+                start_date=start_date_obj,
+                end_date=end_date_obj
+            )
+            _agg_cache[key] = cached
         
-        start_date_obj = datetime.fromisoformat(start_date).date() if start_date else None
-        end_date_obj = datetime.fromisoformat(end_date).date() if end_date else None
+        category_spending, total = cached
         
-        category_spending = await sheets_service.get_spending_by_category(
-            user_id=user_id,
-            start_date=start_date_obj,
-            end_date=end_date_obj
-        )
-        
-        return {
-            "success": True,
-            "user_id": user_id,
-            "category_breakdown": category_spending,
-            "total": sum(category_spending.values()),
-            "period": {
-                "start_date": start_date,
-                "end_date": end_date
-            }
-        }
+        response = _CATEGORY_SKELETON.copy()
+        response["user_id"] = user_id
+        response["category_breakdown"] = category_spending
+        response["total"] = total
+        response["period"] = {"start_date": start_date, "end_date": end_date}
+        return ORJSONResponse(response)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to get category breakdown: {str(e)}"
         )
 
-@router.get("/search/{user_id}")
-async def search_expenses(user_id: str, q: str, current_user: str = Depends(get_current_user)):
+@router.get("/search/{user_id}", response_class=ORJSONResponse, response_model=None)
+async def search_expenses(
+    user_id: str,
+    q: str,
+    sheets_service: GoogleSheetsService = Depends(get_sheets_service)
+):
     """
     Search expenses by description, category, or tags
     """
     try:
         results = await sheets_service.search_expenses(q, user_id)
         
-        return {
-            "success": True,
-            "query": q,
-            "count": len(results),
-            "results": results
-        }
+        response = _SEARCH_SKELETON.copy()
+        response["query"] = q
+        response["count"] = len(results)
+        response["results"] = results
+        return ORJSONResponse(response)
         
     except Exception as e:
         raise HTTPException(
@@ -211,65 +454,42 @@ async def search_expenses(user_id: str, q: str, current_user: str = Depends(get_
 async def update_expense_by_row(
     row_number: int, 
     expense_input: ParsedExpense, 
-    current_user: str = Depends(get_current_user)
+    sheets_service: GoogleSheetsService = Depends(get_sheets_service)
 ):
     """
     Update an existing expense by row number using direct field input
     """
     try:
-        # First check if the row exists
-        existing_expense = await sheets_service.get_expense_by_row(row_number)
-        if not existing_expense:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Expense at row {row_number} not found"
-            )
-        
-        # Convert ParsedExpense to ParsedExpense format
-        from datetime import datetime
-        from app.models.expense import ParsedExpense
-        
-        # Set timestamp if not provided
-        if expense_input.timestamp is None:
+        # Set timestamp if not provided, then fill date and time from it
+        timestamp = expense_input.timestamp
+        if timestamp is None:
             if expense_input.date and expense_input.time:
-                expense_input.timestamp = datetime.combine(expense_input.date, expense_input.time)
+                timestamp = datetime.combine(expense_input.date, expense_input.time)
             else:
-                expense_input.timestamp = datetime.now()
-        
-        # Extract date and time from timestamp
-        current_date = expense_input.date or expense_input.timestamp.date()
-        current_time = expense_input.time or expense_input.timestamp.time()
-        
-        # Create ParsedExpense object
-        parsed_expense = ParsedExpense(
-            timestamp=expense_input.timestamp,
-            date=current_date,
-            time=current_time,
-            amount=expense_input.amount,
-            currency=expense_input.currency,
-            category=expense_input.category,
-            subcategory=expense_input.subcategory,
-            description=expense_input.description,
-            tags=expense_input.tags,
-            location=expense_input.location,
-            payment_method=expense_input.payment_method,
-            notes=expense_input.notes,
-            user_id=expense_input.user_id
-        )
+                timestamp = datetime.now()
         
-        # Update the expense
-        success = await sheets_service.update_expense(row_number, parsed_expense)
+        if timestamp is not expense_input.timestamp or not expense_input.date or not expense_input.time:
+            expense_input = expense_input.model_copy(update={
+                "timestamp": timestamp,
+                "date": expense_input.date or timestamp.date(),
+                "time": expense_input.time or timestamp.time()
+            })
         
-        if not success:
+        # Update the expense if the row exists, in one read and one write
+        existing_expense = await sheets_service.update_expense_if_exists(row_number, expense_input)
+        
+        if not existing_expense:
             raise HTTPException(
-                status_code=500,
-                detail=f"Failed to update expense at row {row_number}"
+                status_code=404,
+                detail=f"Expense at row {row_number} not found"
             )
         
+        _invalidate_aggregates(existing_expense.get('User ID'), expense_input.user_id)
+        
         return {
             "success": True,
             "message": f"Expense at row {row_number} successfully updated",
-            "expense": parsed_expense,
+            "expense": expense_input,
             "row_number": row_number
         }
         
@@ -284,7 +504,7 @@ async def update_expense_by_row(
 @router.delete("/expenses/row/{row_number}")
 async def delete_expense_by_row(
     row_number: int, 
-    current_user: str = Depends(get_current_user)
+    sheets_service: GoogleSheetsService = Depends(get_sheets_service)
 ):
     """
     Delete an expense by row number
@@ -307,6 +527,8 @@ async def delete_expense_by_row(
                 detail=f"Failed to delete expense at row {row_number}"
             )
         
+        _invalidate_aggregates(existing_expense.get('User ID'))
+        
         return {
             "success": True,
             "message": f"Expense at row {row_number} successfully deleted",
@@ -324,7 +546,7 @@ async def delete_expense_by_row(
 @router.get("/expenses/row/{row_number}")
 async def get_expense_by_row(
     row_number: int, 
-    current_user: str = Depends(get_current_user)
+    sheets_service: GoogleSheetsService = Depends(get_sheets_service)
 ):
     """
     Get a specific expense by row number
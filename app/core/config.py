@@ -1,7 +1,6 @@
-from pydantic_settings import BaseSettings
-from dotenv import load_dotenv
-
-load_dotenv()
+from functools import lru_cache
+from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     app_name: str = "Personal Expense Tracker API"
@@ -16,7 +15,12 @@ class Settings(BaseSettings):
     
     # Google AI
     google_ai_api_key: str
-    gemini_model: str
+    gemini_model: str  # expense parsing; a small model such as flash-lite is enough
+    gemini_analytics_model: Optional[str] = None  # analytics query parsing, defaults to gemini_model
+    gemini_parse_thinking_budget: Optional[int] = 0  # 0 disables thinking; unset for models that require it
+    gemini_max_concurrency: int = 16  # in-flight Gemini calls per worker
+    gemini_parse_service_tier: str = "priority"  # interactive expense parsing
+    gemini_analytics_service_tier: str = "flex"  # latency-tolerant analytics queries
     
     # Google Sheets
     google_service_account_json: str
@@ -26,7 +30,8 @@ class Settings(BaseSettings):
     # Default timezone
     default_timezone: str = "Asia/Singapore"
     
-    class Config:
-        env_file = ".env"
+    model_config = SettingsConfigDict(env_file=".env", frozen=True)
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    return Settings()
@@ -1,29 +1,55 @@
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import time
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Optional
+from cachetools import TTLCache
 from app.services.auth_service import auth_service
+from app.services.ai_service import GoogleAIService, ai_service
+from app.services.sheets_service import GoogleSheetsService
+from app.services.analytics_service import AnalyticsService
 
-security = HTTPBearer()
+# OpenAPI security scheme advertised for the Bearer-protected routes
+BEARER_SCHEME = {"HTTPBearer": {"type": "http", "scheme": "bearer"}}
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+# Verified access-token payloads, keyed by a digest of the token so raw tokens aren't held
+_token_cache = TTLCache(maxsize=10_000, ttl=60)
+
+def verify_cached(token: str) -> Optional[dict]:
     """
-    Dependency to verify JWT token and get current user
+    Verify a JWT, reusing the decoded payload while it is cached and unexpired.
+    Returns None if the token is invalid.
     """
-    if not credentials:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Authorization header required",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    token_hash = blake2b(token.encode(), digest_size=16).digest()
     
-    # Verify the token
-    payload = auth_service.verify_token(credentials.credentials)
+    payload = _token_cache.get(token_hash)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        return payload
     
-    # Check if token type is correct
-    if payload.get("type") != "access":
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token type",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    payload = auth_service.try_verify_token(token)
+    if payload is not None and payload.get("type") == "access":
+        _token_cache[token_hash] = payload
+    else:
+        _token_cache.pop(token_hash, None)
     
-    return payload.get("sub")
+    return payload
+
+def get_ai_service() -> GoogleAIService:
+    """
+    Dependency returning the global AI service instance
+    """
+    return ai_service
+
+@lru_cache(maxsize=1)
+def get_sheets_service() -> GoogleSheetsService:
+    """
+    Dependency returning the shared Google Sheets service, created on first use
+    """
+    return GoogleSheetsService()
+
+@lru_cache(maxsize=1)
+def get_analytics_service() -> AnalyticsService:
+    """
+    Dependency returning the shared analytics service, created on first use
+    on top of the shared Sheets and AI services
+    """
+    return AnalyticsService(get_sheets_service(), get_ai_service())
@@ -0,0 +1,63 @@
+import logging
+import random
+import time
+from typing import Any, Optional
+from requests import Response
+from requests.adapters import HTTPAdapter
+from google.auth.credentials import Credentials
+from google.auth.transport.requests import AuthorizedSession
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+logger = logging.getLogger(__name__)
+
+# Keep-alive pool shared by all Google API calls made through one session
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 50
+
+# (connect, read) timeout in seconds for Google API requests
+GOOGLE_API_TIMEOUT = (2.0, 10.0)
+
+def pooled_session(credentials: Credentials) -> AuthorizedSession:
+    """
+    AuthorizedSession with a connection pool large enough for concurrent Sheets calls
+    """
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    return session
+
+class RetryingHTTPClient(HTTPClient):
+    """
+    gspread HTTP client that retries rate-limited and transiently failing Sheets requests
+    with capped exponential backoff and jitter, honoring Retry-After when the API sends it
+    """
+    MAX_RETRIES = 6
+    BASE_DELAY = 0.5
+    MAX_DELAY = 30.0
+    # The request was rejected without being applied, so retrying is safe for any method
+    RETRY_ALWAYS = frozenset({429, 503})
+    # Also retried for reads; a write may have been applied before the failure
+    RETRY_READS = frozenset({408, 500, 502, 504})
+
+    def request(self, method: str, endpoint: str, *args: Any, **kwargs: Any) -> Response:
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                return super().request(method, endpoint, *args, **kwargs)
+            except APIError as e:
+                status = e.response.status_code
+                retryable = status in self.RETRY_ALWAYS or (method.upper() == "GET" and status in self.RETRY_READS)
+                if not retryable or attempt == self.MAX_RETRIES:
+                    raise
+                delay = self._retry_after(e.response)
+                if delay is None:
+                    delay = min(self.MAX_DELAY, self.BASE_DELAY * 2 ** attempt) + random.uniform(0, self.BASE_DELAY)
+                logger.warning("Sheets API returned %d, retrying in %.1fs (attempt %d/%d)", status, delay, attempt + 1, self.MAX_RETRIES)
+                time.sleep(delay)
+
+    def _retry_after(self, response: Response) -> Optional[float]:
+        """Seconds from a Retry-After header, capped at MAX_DELAY, if the API sent one in seconds"""
+        try:
+            return min(float(response.headers["Retry-After"]), self.MAX_DELAY)
+        except (KeyError, TypeError, ValueError):
+            return None
@@ -0,0 +1,123 @@
+import orjson
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.dependencies import verify_cached
+
+# Constant CORS headers for the allow-all policy, built once at import
+_CORS_HEADERS = [
+    (b"access-control-allow-credentials", b"true"),
+    (b"vary", b"Origin"),
+]
+_PREFLIGHT_HEADERS = _CORS_HEADERS + [
+    (b"access-control-allow-methods", b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"),
+    (b"access-control-max-age", b"600"),
+    (b"content-length", b"0"),
+]
+
+class StaticCORSMiddleware:
+    """
+    Allow-all CORS policy as a pure ASGI middleware with precomputed headers
+
+    The request origin is echoed back rather than "*" so credentialed requests keep working.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = request_method = request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Answer preflight requests directly without touching the app
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            headers = [(b"access-control-allow-origin", origin)] + _PREFLIGHT_HEADERS
+            if request_headers is not None:
+                headers.append((b"access-control-allow-headers", request_headers))
+            await send({"type": "http.response.start", "status": 204, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_cors(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + [(b"access-control-allow-origin", origin)] + _CORS_HEADERS
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+# Routes reachable without a Bearer token
+PUBLIC_PATHS = frozenset({"/", "/health", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json"})
+PUBLIC_PREFIXES = ("/auth/",)
+
+def _unauthorized(detail: str) -> tuple:
+    """Pre-render a 401 response as (start message, body message)"""
+    body = orjson.dumps({"detail": detail})
+    start = {
+        "type": "http.response.start",
+        "status": 401,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"www-authenticate", b"Bearer"),
+        ],
+    }
+    return start, {"type": "http.response.body", "body": body}
+
+_MISSING_HEADER = _unauthorized("Authorization header required")
+_INVALID_TOKEN = _unauthorized("Could not validate credentials")
+_INVALID_TOKEN_TYPE = _unauthorized("Invalid token type")
+
+class AuthMiddleware:
+    """
+    Bearer-token authentication for every non-public route, done once per request.
+    The authenticated user id is stored on request.state.user.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if path in PUBLIC_PATHS or path.startswith(PUBLIC_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+
+        if not authorization or authorization[:7].lower() != "bearer ":
+            response = _MISSING_HEADER
+        else:
+            payload = verify_cached(authorization[7:])
+            if payload is None:
+                response = _INVALID_TOKEN
+            elif payload.get("type") != "access":
+                response = _INVALID_TOKEN_TYPE
+            else:
+                scope.setdefault("state", {})["user"] = payload.get("sub")
+                await self.app(scope, receive, send)
+                return
+
+        # Send copies: outer middleware may rewrite the message headers
+        start, body = response
+        await send(dict(start))
+        await send(dict(body))
@@ -0,0 +1,23 @@
+import base64
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+
+def _default(obj: Any) -> Any:
+    """Fallback for types orjson doesn't handle natively, e.g. pandas Timestamps and raw bytes"""
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        # Binary payloads such as PNG charts are base64-encoded once, as they're written out
+        return base64.b64encode(obj).decode("ascii")
+    raise TypeError
+
+def dumps(content: Any) -> bytes:
+    """Serialize content to JSON bytes with the app's orjson options"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
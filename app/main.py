@@ -1,58 +1,90 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+import orjson
+from fastapi import FastAPI, Response
+from fastapi.openapi.utils import get_openapi
 from app.api.expenses import router as expenses_router
 from app.api.auth import router as auth_router
-from app.core.config import settings
+from app.core.config import get_settings
+from app.core.dependencies import BEARER_SCHEME
+from app.core.responses import ORJSONResponse
+from app.core.middleware import AuthMiddleware, StaticCORSMiddleware
 
 # Create FastAPI app
 app = FastAPI(
-    title=settings.app_name,
-    version=settings.app_version,
-    description="AI-powered personal expense tracker with Google Sheets integration"
+    title=get_settings().app_name,
+    version=get_settings().app_version,
+    description="AI-powered personal expense tracker with Google Sheets integration",
+    default_response_class=ORJSONResponse
 )
 
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Authenticate protected routes once per request, ahead of routing
+app.add_middleware(AuthMiddleware)
+
+# Add CORS middleware (allows every origin; configure appropriately for production).
+# Added last so it is outermost and preflights and 401s still get CORS headers.
+app.add_middleware(StaticCORSMiddleware)
 
 # Include routers
 app.include_router(auth_router)
 app.include_router(expenses_router)
 
+def custom_openapi():
+    """OpenAPI schema with the Bearer scheme attached to the expense routes"""
+    if app.openapi_schema:
+        return app.openapi_schema
+    
+    schema = get_openapi(
+        title=app.title,
+        version=app.version,
+        description=app.description,
+        routes=app.routes
+    )
+    schema.setdefault("components", {}).setdefault("securitySchemes", {}).update(BEARER_SCHEME)
+    for path, operations in schema["paths"].items():
+        if path.startswith(expenses_router.prefix):
+            for operation in operations.values():
+                operation["security"] = [{name: []} for name in BEARER_SCHEME]
+    
+    app.openapi_schema = schema
+    return schema
+
+app.openapi = custom_openapi
+
+# Static endpoint payloads are serialized once at import time
+_ROOT_JSON = orjson.dumps({
+    "message": "Personal Expense Tracker API",
+    "version": get_settings().app_version,
+    "authentication": {
+        "login": "/auth/login",
+        "verify": "/auth/verify",
+        "note": "All expense endpoints require Bearer token authentication"
+    },
+    "endpoints": {
+        "add_expense": "/api/v1/expenses",
+        "add_expenses_bulk": "/api/v1/expenses/bulk",
+        "bulk_job_status": "/api/v1/expenses/bulk/{job_id}",
+        "get_analytics": "/api/v1/analytics",
+        "get_analytics_batch": "/api/v1/analytics/batch",
+        "get_expenses": "/api/v1/expenses/{user_id}",
+        "get_expense_by_row": "/api/v1/expenses/row/{row_number}",
+        "update_expense_by_row": "PUT /api/v1/expenses/row/{row_number}",
+        "delete_expense_by_row": "DELETE /api/v1/expenses/row/{row_number}",
+        "total_spending": "/api/v1/spending/total/{user_id}",
+        "category_breakdown": "/api/v1/spending/category/{user_id}",
+        "search": "/api/v1/search/{user_id}",
+        "docs": "/docs"
+    }
+})
+_HEALTH_JSON = orjson.dumps({"status": "healthy", "service": "personal-expense-api"})
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
-    return {
-        "message": "Personal Expense Tracker API",
-        "version": settings.app_version,
-        "authentication": {
-            "login": "/auth/login",
-            "verify": "/auth/verify",
-            "note": "All expense endpoints require Bearer token authentication"
-        },
-        "endpoints": {
-            "add_expense": "/api/v1/expenses",
-            "get_analytics": "/api/v1/analytics",
-            "get_expenses": "/api/v1/expenses/{user_id}",
-            "get_expense_by_row": "/api/v1/expenses/row/{row_number}",
-            "update_expense_by_row": "PUT /api/v1/expenses/row/{row_number}",
-            "delete_expense_by_row": "DELETE /api/v1/expenses/row/{row_number}",
-            "total_spending": "/api/v1/spending/total/{user_id}",
-            "category_breakdown": "/api/v1/spending/category/{user_id}",
-            "search": "/api/v1/search/{user_id}",
-            "docs": "/docs"
-        }
-    }
+    return Response(_ROOT_JSON, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "personal-expense-api"}
+    return Response(_HEALTH_JSON, media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
@@ -60,5 +92,10 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=8080,
-        reload=settings.debug
+        loop="uvloop",
+        http="httptools",
+        # One worker, as in the Dockerfile: the response caches are per process and
+        # writes only invalidate the worker that handled them
+        workers=1,
+        reload=get_settings().debug
     )
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, List, Literal, Union
 from datetime import datetime, date as date_type, time as time_type
 from enum import Enum
 
@@ -21,7 +21,14 @@ class ExpenseInput(BaseModel):
     text: str
     user_id: Optional[str] = "default_user"
 
+class BulkExpenseInput(BaseModel):
+    texts: List[str]
+    user_id: Optional[str] = "default_user"
+    background: bool = False  # force the discounted Gemini Batch API path
+
 class ParsedExpense(BaseModel):
+    model_config = ConfigDict(frozen=True, use_enum_values=True)
+    
     timestamp: datetime
     date: date_type
     time: time_type
@@ -37,6 +44,8 @@ class ParsedExpense(BaseModel):
     user_id: str = "default_user"
 
 class ExpenseResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     success: bool
     message: str
     expense: Optional[ParsedExpense] = None
@@ -45,14 +54,26 @@ class ExpenseResponse(BaseModel):
 class AnalyticsRequest(BaseModel):
     query: str
     user_id: Optional[str] = "default_user"
+    # "plotly_json" for a Plotly figure spec to draw client-side; "png" for an inline
+    # base64 image or "png_url" for a link to the image, for clients that need a raster
+    visualization_format: Literal["plotly_json", "png", "png_url"] = "plotly_json"
     # start_date: Optional[date_type] = None
     # end_date: Optional[date_type] = None
 
+class AnalyticsBatchRequest(BaseModel):
+    queries: List[str]
+    user_id: Optional[str] = "default_user"
+    visualization_format: Literal["plotly_json", "png", "png_url"] = "plotly_json"
+
 class AnalyticsResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     success: bool
     message: str
     data: Optional[dict] = None
-    visualization: Optional[str] = None  # base64 encoded image
+    visualization: Optional[Union[str, dict]] = None  # base64 encoded image or Plotly figure spec
+    visualization_format: Optional[str] = None
+    visualization_url: Optional[str] = None
     query: Optional[str] = None
     start_date: Optional[date_type] = None
     end_date: Optional[date_type] = None
@@ -0,0 +1,13 @@
+import numpy as np
+
+def rolling_mean(values, window: int) -> np.ndarray:
+    """
+    Trailing mean over each full window of `window` points, as one convolution.
+    Returns len(values) - window + 1 means (empty if the series is shorter than the window).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size < window:
+        return np.empty(0)
+    # Unlike differencing a running cumsum, each mean is summed from its own window,
+    # so rounding error doesn't build up along long series
+    return np.convolve(values, np.full(window, 1.0 / window), mode="valid")
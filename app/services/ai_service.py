@@ -1,180 +1,581 @@
-from typing import Dict, Any, List, Optional
-from google import genai
-from google.genai import types
-from datetime import datetime, date, time, timedelta
-import json
+import asyncio
+import logging
+import random
 import re
-import pytz
-from app.core.config import settings
+import time
+from collections import deque
+from functools import lru_cache
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+import httpx
+import orjson
+from cachetools import LRUCache, TTLCache
+from google import genai
+from google.genai import errors, types
+from app.core.config import get_settings
 from app.models.expense import ParsedExpense, ExpenseCategory
 
+logger = logging.getLogger(__name__)
+
+# Parsed expenses keyed by (Singapore date, normalized text), so repeated inputs skip Gemini.
+# The date is part of the key because relative phrases like "yesterday" depend on it.
+_parse_cache: LRUCache = LRUCache(maxsize=4096)
+
+# Parsed analytics queries keyed by (Singapore date, normalized query); the prompt only
+# depends on those two, so repeated questions skip the model for a few minutes
+_query_cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
+# Query parses in progress by the same key, so identical concurrent questions share one call
+_query_parses: Dict[tuple, "asyncio.Future"] = {}
+
+# A parsed timestamp this close to the reference time means no time was given in the text
+_NOW_TOLERANCE = timedelta(minutes=1)
+
+_SG_TZ = ZoneInfo('Asia/Singapore')
+_CATEGORY_BY_VALUE = {category.value: category for category in ExpenseCategory}
+# Currencies kept as parsed; anything else is recorded as SGD
+_KNOWN_CURRENCIES = frozenset({'SGD', 'USD', 'EUR', 'GBP', 'JPY', 'CNY', 'MYR', 'THB', 'IDR', 'PHP', 'VND'})
+
+_AMOUNT_RE = re.compile(r'\$?(\d+\.?\d*)')
+
+# Fallback category keywords in priority order: when keywords from several categories appear,
+# the category listed first wins. The matcher below is built from this table, so adding
+# keywords or categories never touches the matching loop.
+_FALLBACK_CATEGORY_KEYWORDS = (
+    ('food', ('eat', 'food', 'lunch', 'dinner', 'breakfast', 'restaurant')),
+    ('transportation', ('transport', 'taxi', 'bus', 'train', 'grab')),
+    ('shopping', ('shop', 'buy', 'purchase')),
+    ('family', ('kids', 'toys')),
+)
+_KEYWORD_CATEGORY = {
+    keyword: (priority, category)
+    for priority, (category, keywords) in enumerate(_FALLBACK_CATEGORY_KEYWORDS)
+    for keyword in keywords
+}
+_KEYWORD_ALTERNATION = '|'.join(re.escape(keyword) for keyword in sorted(_KEYWORD_CATEGORY, key=len, reverse=True))
+# One alternation over every keyword, matched as substrings in a single left-to-right pass;
+# the lookahead lets overlapping keywords all match. Only the last-resort fallback uses it
+_CATEGORY_KEYWORD_RE = re.compile('(?=(' + _KEYWORD_ALTERNATION + '))')
+# The same keywords as whole words only, for the local fast path, which skips Gemini and so
+# must not take "training" for a train or "business class" for a bus
+_CATEGORY_WORD_RE = re.compile(r'\b(' + _KEYWORD_ALTERNATION + r')\b')
+
+# One-liners like "lunch $12.50" or "taxi 8 sgd": a short description, an amount with at most
+# two decimals and an optional currency code. Anything else goes to Gemini.
+_SIMPLE_EXPENSE_RE = re.compile(
+    r'^\s*(?P<description>[A-Za-z ]{1,30}?)\s*\$?(?P<amount>\d+(?:\.\d{1,2})?)\s*'
+    r'(?P<currency>' + '|'.join(sorted(_KNOWN_CURRENCIES)) + r')?\s*$',
+    re.IGNORECASE
+)
+
+def _keyword_category(text: str, pattern: re.Pattern = _CATEGORY_KEYWORD_RE) -> Optional[str]:
+    """Highest-priority fallback category whose keyword pattern matches in text, or None"""
+    category = None
+    best_priority = len(_FALLBACK_CATEGORY_KEYWORDS)
+    for match in pattern.finditer(text.lower()):
+        priority, candidate = _KEYWORD_CATEGORY[match.group(1)]
+        if priority < best_priority:
+            category, best_priority = candidate, priority
+            if priority == 0:
+                break
+    return category
+
+# Words that mark an analytics query as a comparison, matched as substrings in one pass
+_COMPARISON_RE = re.compile('comparison|compare|versus|vs')
+
+_WHITESPACE = re.compile(r'\s+')
+_DOLLAR_BEFORE_AMOUNT = re.compile(r'\$(?=\d)')
+
+# Static prompt instructions, sent as the system instruction so every request shares the
+# same prefix and Gemini's implicit prompt caching can reuse it; only the input text varies
+EXPENSE_INSTRUCTIONS = """
+Parse the expense text given by the user into structured data. Extract all relevant information and return a JSON response.
+
+Please extract and return the following information in JSON format:
+{
+    "timestamp": "ISO datetime string (if time mentioned, otherwise current Singapore time)",
+    "amount": "numeric amount (required)",
+    "currency": "currency code (ALWAYS use SGD unless specifically mentioned otherwise in the text)",
+    "category": "one of: food, transportation, entertainment, utilities, shopping, groceries, healthcare, education, travel, subscription, family, other",
+    "subcategory": "more specific category if applicable",
+    "description": "clear description of the expense",
+    "tags": ["relevant", "tags", "as", "array"],
+    "location": "location if mentioned",
+    "payment_method": "cash, card, online, etc. if mentioned",
+    "notes": "any additional notes or context"
+}
+
+Rules:
+- If no time is specified, use the current Singapore time given with the text
+- If no date is specified, assume today
+- Amount is required and must be a number
+- Currency must ALWAYS be SGD unless the user explicitly mentions another currency (USD, EUR, etc.)
+- Category must be one of the specified options
+- Description should be clear and concise
+- Tags should be relevant keywords
+- Return only valid JSON
+- All times should be in Singapore timezone (GMT+8)
+"""
+
+ANALYTICS_INSTRUCTIONS = """
+Parse the analytics query given by the user to understand what they want to analyze about their expenses.
+The current date is given with the query.
+
+Extract and return the following information in JSON format:
+{
+    "analysis_type": "one of: comparison, trend, category_breakdown, total, period_analysis",
+    "comparison_type": "if comparison: time_periods, categories, categories_over_time, null",
+    "time_periods": [
+        {
+            "label": "descriptive name for the period",
+            "start_date": "YYYY-MM-DD or null",
+            "end_date": "YYYY-MM-DD or null"
+        }
+    ],
+    "categories": ["list of specific categories if mentioned, or null for all"],
+    "granularity": "day, week, month, year",
+    "specific_insights": ["list of specific things user wants to know"],
+    "chart_type": "pie, bar, line, comparison_bar, side_by_side",
+    "include_category_breakdown": true/false
+}
+
+Examples:
+- "compare this month vs last month" → comparison of two time periods
+- "compare food and transportation spending last 3 months" → category comparison over time
+- "show me July vs August expenses by category" → category comparison between specific months
+- "how much did I spend on food in the last two weeks" → category analysis for specific period
+- "compare my spending pattern between weekdays and weekends" → pattern comparison
+- "show daily expenses for the past week" → trend analysis
+
+Important rules:
+1. For "this month" use current month from start to today
+2. For "last month" use the complete previous month
+3. For "last X days/weeks/months" count backwards from today
+4. When comparing periods, create separate entries in time_periods array
+5. If categories are mentioned specifically, include them in categories array
+6. Choose appropriate chart_type based on the analysis needed
+
+Return only valid JSON, no explanations.
+"""
+
+# Fixed pieces of the per-call prompts; only the user input and reference time are joined in
+_EXPENSE_PROMPT_PARTS = ('Text: "', '"\nCurrent Singapore datetime for reference: ')
+_ANALYTICS_PROMPT_PARTS = ('Query: "', '"\nCurrent date: ')
+
+# Structured-output schema for expense parsing, so Gemini returns exactly these fields
+EXPENSE_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "timestamp": {"type": "string"},
+        "amount": {"type": "number"},
+        "currency": {"type": "string"},
+        "category": {"type": "string", "enum": [category.value for category in ExpenseCategory]},
+        "subcategory": {"type": ["string", "null"]},
+        "description": {"type": "string"},
+        "tags": {"type": "array", "items": {"type": "string"}},
+        "location": {"type": ["string", "null"]},
+        "payment_method": {"type": ["string", "null"]},
+        "notes": {"type": ["string", "null"]}
+    },
+    "required": ["timestamp", "amount", "currency", "category", "description"]
+}
+
+class _JSONObjectScanner:
+    """
+    Incremental scanner for the first balanced {...} object in a stream of text chunks,
+    tracking string literals and escapes so braces inside strings are ignored
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """Consume the next chunk; returns the complete object once its closing brace arrives"""
+        index = 0
+        if not self._started:
+            index = chunk.find('{')
+            if index == -1:
+                return None
+            self._started = True
+        
+        for position in range(index, len(chunk)):
+            char = chunk[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._buffer.append(chunk[index:position + 1])
+                    return "".join(self._buffer)
+        
+        self._buffer.append(chunk[index:])
+        return None
+
+def _extract_json_object(text: str) -> str:
+    """Return the first balanced {...} object in text with a single linear scan"""
+    if '{' not in text:
+        raise ValueError("No JSON object found in response")
+    json_object = _JSONObjectScanner().feed(text)
+    if json_object is None:
+        raise ValueError("Unterminated JSON object in response")
+    return json_object
+
+def _parse_json_response(text: str) -> Dict[str, Any]:
+    """Parse a Gemini JSON-mode response, tolerating fences or stray text around the object"""
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return orjson.loads(_extract_json_object(text))
+
+def _normalize_text(text: str) -> str:
+    """Lowercase, collapse whitespace and drop the default-currency symbol before amounts"""
+    return _DOLLAR_BEFORE_AMOUNT.sub('', _WHITESPACE.sub(' ', text.strip().lower()))
+
+@lru_cache(maxsize=None)
+def _shared_client(api_key: str) -> genai.Client:
+    """One Gemini client per API key, so every service instance reuses its connection pool"""
+    return genai.Client(api_key=api_key)
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+_RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+def _is_retryable(error: Exception) -> bool:
+    """Whether a failed Gemini call is transient and worth retrying"""
+    if isinstance(error, errors.APIError):
+        return error.code in _RETRYABLE_STATUS
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+class _CircuitBreaker:
+    """
+    Opens after `threshold` failures within `window` seconds and stays open for `cooldown`
+    seconds, so callers skip straight to their fallback during an outage
+    """
+
+    def __init__(self, threshold: int, window: float, cooldown: float):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self._failures: deque = deque()
+        self._open_until = 0.0
+
+    def allow(self) -> bool:
+        return time.monotonic() >= self._open_until
+
+    def record_success(self):
+        self._failures.clear()
+
+    def record_failure(self):
+        now = time.monotonic()
+        self._failures.append(now)
+        while self._failures and now - self._failures[0] > self.window:
+            self._failures.popleft()
+        if len(self._failures) >= self.threshold:
+            self._open_until = now + self.cooldown
+            self._failures.clear()
+            logger.warning("Gemini circuit opened for %.0fs after repeated failures", self.cooldown)
+
 class GoogleAIService:
+    # Transient Gemini errors are retried with jittered exponential backoff
+    RETRY_ATTEMPTS = 4
+    RETRY_BASE_DELAY = 1.0
+    RETRY_MAX_DELAY = 30.0
+    # Circuit breaker: this many failed calls within the window skip Gemini for the cooldown
+    BREAKER_THRESHOLD = 5
+    BREAKER_WINDOW = 30.0
+    BREAKER_COOLDOWN = 30.0
+    
+    # Batch jobs are polled at this interval (seconds) until they reach a terminal state
+    BATCH_POLL_INTERVAL = 30
+    BATCH_TERMINAL_STATES = frozenset({
+        "JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"
+    })
+
     def __init__(self):
-        self.client = genai.Client(api_key=settings.google_ai_api_key)
+        settings = get_settings()
+        self.client = _shared_client(settings.google_ai_api_key)
         self.model_name = settings.gemini_model
-        self.singapore_tz = pytz.timezone('Asia/Singapore')
+        self.analytics_model_name = settings.gemini_analytics_model or settings.gemini_model
+        self.max_concurrency = settings.gemini_max_concurrency
+        
+        # Request configs are built once and reused for every call
+        thinking_budget = settings.gemini_parse_thinking_budget
+        self.parse_config = types.GenerateContentConfig(
+            system_instruction=EXPENSE_INSTRUCTIONS,
+            response_mime_type="application/json",
+            response_json_schema=EXPENSE_RESPONSE_SCHEMA,
+            thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget) if thinking_budget is not None else None,
+            service_tier=settings.gemini_parse_service_tier
+        )
+        self.analytics_config = types.GenerateContentConfig(
+            system_instruction=ANALYTICS_INSTRUCTIONS,
+            response_mime_type="application/json",
+            service_tier=settings.gemini_analytics_service_tier
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._breaker = _CircuitBreaker(self.BREAKER_THRESHOLD, self.BREAKER_WINDOW, self.BREAKER_COOLDOWN)
+        # (epoch second, Singapore datetime, ISO string) for the current second
+        self._now_cache: Tuple[int, Optional[datetime], str] = (-1, None, "")
 
-    async def _generate_json(self, prompt: str) -> Dict[str, Any]:
-        """Generate a JSON response using the configured Gemini model."""
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Concurrency cap for Gemini calls, created for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _request_json(self, prompt: str, model: str, config: types.GenerateContentConfig) -> Dict[str, Any]:
+        """Make a single Gemini request and parse its JSON response"""
         response = await self.client.aio.models.generate_content(
-            model=self.model_name,
+            model=model,
             contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json"
-            ),
+            config=config,
         )
-        return json.loads(response.text)
+        return _parse_json_response(response.text)
+    
+    async def _stream_json(self, prompt: str, model: str, config: types.GenerateContentConfig) -> Dict[str, Any]:
+        """
+        Stream a Gemini response and parse the JSON object as soon as its closing brace
+        arrives, closing the stream without waiting for any trailing output
+        """
+        scanner = _JSONObjectScanner()
+        stream = await self.client.aio.models.generate_content_stream(
+            model=model,
+            contents=prompt,
+            config=config,
+        )
+        try:
+            async for chunk in stream:
+                json_object = scanner.feed(chunk.text or "")
+                if json_object is not None:
+                    return orjson.loads(json_object)
+        finally:
+            await stream.aclose()
+        
+        raise ValueError("No complete JSON object in streamed response")
+    
+    async def _generate_json(
+        self,
+        prompt: str,
+        model: str,
+        config: types.GenerateContentConfig,
+        stream: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Generate a JSON response with the given Gemini model and request config.
+        Transient errors are retried with backoff; while the circuit is open this raises immediately.
+        """
+        if not self._breaker.allow():
+            raise RuntimeError("Gemini circuit is open, skipping call")
+        
+        request = self._stream_json if stream else self._request_json
+        for attempt in range(self.RETRY_ATTEMPTS):
+            try:
+                async with self._get_semaphore():
+                    data = await request(prompt, model, config)
+                break
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                if attempt == self.RETRY_ATTEMPTS - 1:
+                    self._breaker.record_failure()
+                    raise
+                delay = min(self.RETRY_MAX_DELAY, self.RETRY_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.0)
+                logger.warning("Gemini call failed (%s), retrying in %.1fs (attempt %d/%d)", e, delay, attempt + 1, self.RETRY_ATTEMPTS)
+                await asyncio.sleep(delay)
+        
+        self._breaker.record_success()
+        return data
     
     def _convert_to_singapore_time(self, dt: datetime) -> datetime:
         """Convert datetime to Singapore timezone"""
-        if dt.tzinfo is None:
-            # If naive datetime, assume it's UTC
-            dt = pytz.UTC.localize(dt)
+        # If naive datetime, assume it's UTC
+        return (dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt).astimezone(_SG_TZ)
+    
+    def _current_singapore_now(self) -> Tuple[datetime, str]:
+        """Current Singapore time and its ISO string, recomputed at most once per second"""
+        second = int(time.time())
+        cached_second, cached_now, cached_iso = self._now_cache
+        if cached_second == second:
+            return cached_now, cached_iso
         
-        # Convert to Singapore time
-        singapore_dt = dt.astimezone(self.singapore_tz)
-        return singapore_dt
+        now = datetime.now(_SG_TZ)
+        iso = now.isoformat()
+        self._now_cache = (second, now, iso)
+        return now, iso
     
     def _get_current_singapore_time(self) -> datetime:
-        """Get current time in Singapore timezone"""
-        utc_now = datetime.now(pytz.UTC)
-        return self._convert_to_singapore_time(utc_now)
+        """Get current time in Singapore timezone (second precision is enough here)"""
+        return self._current_singapore_now()[0]
+    
+    def _expense_prompt(self, text: str, current_sg_iso: str) -> str:
+        """Build the per-call part of the expense-parsing prompt; the instructions are sent separately"""
+        return "".join((_EXPENSE_PROMPT_PARTS[0], text, _EXPENSE_PROMPT_PARTS[1], current_sg_iso))
     
     async def parse_expense_text(self, text: str) -> ParsedExpense:
         """
         Parse natural language expense text using Google AI
         """
-        current_sg_time = self._get_current_singapore_time()
-        
-        prompt = f"""
-        Parse the following expense text into structured data. Extract all relevant information and return a JSON response.
-        
-        Text: "{text}"
-        
-        Please extract and return the following information in JSON format:
-        {{
-            "timestamp": "ISO datetime string (if time mentioned, otherwise current Singapore time)",
-            "amount": "numeric amount (required)",
-            "currency": "currency code (ALWAYS use SGD unless specifically mentioned otherwise in the text)",
-            "category": "one of: food, transportation, entertainment, utilities, shopping, groceries, healthcare, education, travel, subscription, family, other",
-            "subcategory": "more specific category if applicable",
-            "description": "clear description of the expense",
-            "tags": ["relevant", "tags", "as", "array"],
-            "location": "location if mentioned",
-            "payment_method": "cash, card, online, etc. if mentioned",
-            "notes": "any additional notes or context"
-        }}
-        
-        Rules:
-        - If no time is specified, use current Singapore time
-        - If no date is specified, assume today
-        - Amount is required and must be a number
-        - Currency must ALWAYS be SGD unless the user explicitly mentions another currency (USD, EUR, etc.)
-        - Category must be one of the specified options
-        - Description should be clear and concise
-        - Tags should be relevant keywords
-        - Return only valid JSON
-        - All times should be in Singapore timezone (GMT+8)
-        
-        Current Singapore datetime for reference: {current_sg_time.isoformat()}
-        """
+        current_sg_time, current_sg_iso = self._current_singapore_now()
+        
+        cache_key = (current_sg_time.date(), _normalize_text(text))
+        cached = _parse_cache.get(cache_key)
+        if cached is not None:
+            expense, stamped_now = cached
+            if stamped_now:
+                # No time in the text, so re-stamp with the current time
+                expense = expense.model_copy(update={
+                    "timestamp": current_sg_time,
+                    "date": current_sg_time.date(),
+                    "time": current_sg_time.time()
+                })
+            return expense
+        
+        expense = self._quick_parse(text, current_sg_time)
+        if expense is not None:
+            logger.debug("Parsed expense locally without Gemini: %r", text)
+            return expense
+        
+        prompt = self._expense_prompt(text, current_sg_iso)
         
         try:
-            parsed_data = await self._generate_json(prompt)
+            parsed_data = await self._generate_json(prompt, self.model_name, self.parse_config, stream=True)
             
             # Convert to ParsedExpense model
             expense = self._convert_to_expense_model(parsed_data)
+            
+            stamped_now = abs(expense.timestamp - current_sg_time) < _NOW_TOLERANCE
+            _parse_cache[cache_key] = (expense, stamped_now)
             return expense
             
-        except Exception as e:
+        except Exception:
+            logger.exception("Error parsing expense text, falling back to local parsing")
             # Fallback parsing if AI fails
             return self._fallback_parse(text)
     
+    def quick_parse_texts(self, texts: List[str]) -> List[Optional[ParsedExpense]]:
+        """Parse simple one-liners locally, with None for each text that needs Gemini"""
+        current_sg_time = self._current_singapore_now()[0]
+        return [self._quick_parse(text, current_sg_time) for text in texts]
+    
+    async def parse_expense_texts_batch(self, texts: List[str]) -> List[ParsedExpense]:
+        """
+        Parse many expense texts in one Gemini Batch API job.
+        Batch jobs are billed at a discount but can take minutes to finish, so this is for
+        non-interactive bulk imports; run quick_parse_texts first so simple one-liners skip
+        the job. Items the job fails to parse fall back to local parsing.
+        """
+        if not texts:
+            return []
+        current_sg_iso = self._current_singapore_now()[1]
+        
+        job = await self.client.aio.batches.create(
+            model=self.model_name,
+            src=[
+                {
+                    "contents": [{"role": "user", "parts": [{"text": self._expense_prompt(text, current_sg_iso)}]}],
+                    "config": {
+                        "system_instruction": EXPENSE_INSTRUCTIONS,
+                        "response_mime_type": "application/json",
+                        "response_json_schema": EXPENSE_RESPONSE_SCHEMA
+                    }
+                }
+                for text in texts
+            ]
+        )
+        
+        while job.state.name not in self.BATCH_TERMINAL_STATES:
+            await asyncio.sleep(self.BATCH_POLL_INTERVAL)
+            job = await self.client.aio.batches.get(name=job.name)
+        
+        if job.state.name != "JOB_STATE_SUCCEEDED":
+            raise RuntimeError(f"Batch job {job.name} finished with state {job.state.name}")
+        
+        responses = job.dest.inlined_responses or []
+        expenses = []
+        for position, text in enumerate(texts):
+            try:
+                expenses.append(self._convert_to_expense_model(_parse_json_response(responses[position].response.text)))
+            except Exception:
+                logger.warning("Batch job %s couldn't parse item %d, falling back to local parsing", job.name, position, exc_info=True)
+                expenses.append(self._fallback_parse(text))
+        
+        return expenses
+    
     async def parse_analytics_query(self, query: str) -> Dict[str, Any]:
         """
         Parse natural language analytics query to extract specific requirements
         """
-        current_sg_time = self._get_current_singapore_time()
-        current_date = current_sg_time.date()
-        
-        prompt = f"""
-        Parse the following analytics query to understand what the user wants to analyze about their expenses.
-        
-        Query: "{query}"
-        Current date: {current_date}
-        
-        Extract and return the following information in JSON format:
-        {{
-            "analysis_type": "one of: comparison, trend, category_breakdown, total, period_analysis",
-            "comparison_type": "if comparison: time_periods, categories, categories_over_time, null",
-            "time_periods": [
-                {{
-                    "label": "descriptive name for the period",
-                    "start_date": "YYYY-MM-DD or null",
-                    "end_date": "YYYY-MM-DD or null"
-                }}
-            ],
-            "categories": ["list of specific categories if mentioned, or null for all"],
-            "granularity": "day, week, month, year",
-            "specific_insights": ["list of specific things user wants to know"],
-            "chart_type": "pie, bar, line, comparison_bar, side_by_side",
-            "include_category_breakdown": true/false
-        }}
-        
-        Examples:
-        - "compare this month vs last month" → comparison of two time periods
-        - "compare food and transportation spending last 3 months" → category comparison over time
-        - "show me July vs August expenses by category" → category comparison between specific months
-        - "how much did I spend on food in the last two weeks" → category analysis for specific period
-        - "compare my spending pattern between weekdays and weekends" → pattern comparison
-        - "show daily expenses for the past week" → trend analysis
-        
-        Important rules:
-        1. For "this month" use current month from start to today
-        2. For "last month" use the complete previous month
-        3. For "last X days/weeks/months" count backwards from today
-        4. When comparing periods, create separate entries in time_periods array
-        5. If categories are mentioned specifically, include them in categories array
-        6. Choose appropriate chart_type based on the analysis needed
-        
-        Return only valid JSON, no explanations.
-        """
+        # The ISO datetime starts with the YYYY-MM-DD date
+        current_date = self._current_singapore_now()[1][:10]
+        
+        cache_key = (current_date, _WHITESPACE.sub(' ', query.strip().lower()))
+        cached = _query_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        pending = _query_parses.get(cache_key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        
+        pending = asyncio.get_running_loop().create_future()
+        _query_parses[cache_key] = pending
+        prompt = "".join((_ANALYTICS_PROMPT_PARTS[0], query, _ANALYTICS_PROMPT_PARTS[1], current_date))
         
         try:
-            return await self._generate_json(prompt)
+            parsed = await self._generate_json(prompt, self.analytics_model_name, self.analytics_config)
+            # Only model answers are cached; fallbacks are retried on the next ask
+            _query_cache[cache_key] = parsed
             
-        except Exception as e:
-            print(f"Error parsing analytics query: {e}")
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception:
+            logger.exception("Error parsing analytics query, falling back to keyword parsing")
             # Fallback to simple parsing
-            return self._fallback_query_parsing(query)
+            parsed = self._fallback_query_parsing(query)
+            
+        finally:
+            _query_parses.pop(cache_key, None)
+        
+        pending.set_result(parsed)
+        return parsed
     
     def _convert_to_expense_model(self, data: Dict[str, Any]) -> ParsedExpense:
         """Convert parsed data to ParsedExpense model"""
         # Parse timestamp and convert to Singapore time
-        timestamp_str = data.get('timestamp', self._get_current_singapore_time().isoformat())
+        timestamp_str = data.get('timestamp') or self._current_singapore_now()[1]
         
         try:
-            # Parse the timestamp
-            if timestamp_str.endswith('Z'):
-                timestamp_str = timestamp_str[:-1] + '+00:00'
-            
+            # Python 3.11+ fromisoformat accepts a trailing 'Z' natively
             timestamp = datetime.fromisoformat(timestamp_str)
             
             # Convert to Singapore time if not already
             singapore_timestamp = self._convert_to_singapore_time(timestamp)
             
-        except Exception as e:
+        except (TypeError, ValueError):
             # Fallback to current Singapore time if parsing fails
             singapore_timestamp = self._get_current_singapore_time()
         
         # Ensure category is valid
-        category = data.get('category', 'other').lower()
-        if category not in [cat.value for cat in ExpenseCategory]:
-            category = 'other'
+        category = _CATEGORY_BY_VALUE.get(str(data.get('category') or 'other').lower(), ExpenseCategory.OTHER)
         
         # Ensure currency is SGD unless explicitly specified otherwise
-        currency = data.get('currency', 'SGD').upper()
-        if currency not in ['USD', 'EUR', 'GBP', 'JPY', 'CNY', 'MYR', 'THB', 'IDR', 'PHP', 'VND']:
+        currency = str(data.get('currency') or 'SGD').upper()
+        if currency not in _KNOWN_CURRENCIES:
             currency = 'SGD'  # Default to SGD for any unrecognized currency
         
         return ParsedExpense(
@@ -183,7 +584,7 @@ class GoogleAIService:
             time=singapore_timestamp.time(),
             amount=float(data['amount']),
             currency=currency,
-            category=ExpenseCategory(category),
+            category=category,
             subcategory=data.get('subcategory'),
             description=data.get('description', 'Expense'),
             tags=data.get('tags', []),
@@ -193,23 +594,39 @@ class GoogleAIService:
             user_id="default_user"
         )
     
+    def _quick_parse(self, text: str, current_sg_time: datetime) -> Optional[ParsedExpense]:
+        """
+        Parse simple one-line expenses like "lunch $12.50" locally, without calling Gemini.
+        Returns None unless both the pattern and a category keyword, as a whole word, match.
+        """
+        match = _SIMPLE_EXPENSE_RE.match(text)
+        if match is None:
+            return None
+        
+        category = _keyword_category(match.group('description'), _CATEGORY_WORD_RE)
+        if category is None:
+            return None
+        
+        return ParsedExpense(
+            timestamp=current_sg_time,
+            date=current_sg_time.date(),
+            time=current_sg_time.time(),
+            amount=float(match.group('amount')),
+            currency=(match.group('currency') or 'SGD').upper(),
+            category=category,
+            description=match.group('description').strip(),
+            tags=[],
+            user_id="default_user"
+        )
+    
     def _fallback_parse(self, text: str) -> ParsedExpense:
         """Fallback parsing if AI fails"""
         # Simple regex to extract amount
-        amount_match = re.search(r'\$?(\d+\.?\d*)', text)
+        amount_match = _AMOUNT_RE.search(text)
         amount = float(amount_match.group(1)) if amount_match else 0.0
         
         # Simple category detection
-        category = 'other'
-        text_lower = text.lower()
-        if any(word in text_lower for word in ['eat', 'food', 'lunch', 'dinner', 'breakfast', 'restaurant']):
-            category = 'food'
-        elif any(word in text_lower for word in ['transport', 'taxi', 'bus', 'train', 'grab']):
-            category = 'transportation'
-        elif any(word in text_lower for word in ['shop', 'buy', 'purchase']):
-            category = 'shopping'
-        elif any(word in text_lower for word in ['kids', 'toys']):
-            category = 'family'
+        category = _keyword_category(text) or 'other'
         
         # Use current Singapore time
         singapore_time = self._get_current_singapore_time()
@@ -220,7 +637,7 @@ class GoogleAIService:
             time=singapore_time.time(),
             amount=amount,
             currency='SGD',
-            category=ExpenseCategory(category),
+            category=category,
             description=text,
             tags=[],
             user_id="default_user"
@@ -245,7 +662,7 @@ class GoogleAIService:
         }
         
         # Detect comparison patterns
-        if any(word in query_lower for word in ['vs', 'versus', 'compare', 'comparison']):
+        if _COMPARISON_RE.search(query_lower):
             result["analysis_type"] = "comparison"
             result["comparison_type"] = "time_periods"
             result["chart_type"] = "comparison_bar"
@@ -260,3 +677,6 @@ class GoogleAIService:
             ]
         
         return result
+
+# Create global AI service instance
+ai_service = GoogleAIService()
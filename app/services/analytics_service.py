@@ -1,39 +1,265 @@
-import plotly.graph_objects as go
-import plotly.express as px
+import numpy as np
 import pandas as pd
-import base64
-import io
-from typing import Dict, Any, List, Optional
+import asyncio
+import calendar
+import re
+import uuid
+from functools import lru_cache, wraps
+from hashlib import blake2b
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import date, datetime, timedelta
+import orjson
+from cachetools import TTLCache
 from app.services.sheets_service import GoogleSheetsService
-from app.services.ai_service import GoogleAIService
+from app.services.ai_service import GoogleAIService, ai_service as shared_ai_service
+from app.services._kernels import rolling_mean
+from app.services.charts import bar_spec, downsample_indices, grouped_bar_spec, line_spec, line_trace_type, pie_spec, render_png, to_plotly_json
+
+# Result for an analysis with no expenses in range; _cached_analysis hands out copies
+_NO_EXPENSES = MappingProxyType({
+    "message": "No expenses found for the specified period.",
+    "data": {},
+    "visualization": None
+})
+
+# Finished analysis results, chart included, keyed by (kind, user_id, start_date, end_date, *options).
+# Shared by all instances so writes anywhere can invalidate it.
+_analysis_cache = TTLCache(maxsize=512, ttl=300)
+
+# Per-user counters bumped by AnalyticsService.invalidate. A read or analysis started under
+# an older value may predate the write, so its result is returned but not cached.
+_data_generations: Dict[str, int] = {}
+
+def _last_month(today: date) -> tuple[date, date]:
+    year, month = (today.year - 1, 12) if today.month == 1 else (today.year, today.month - 1)
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+def _last_week(today: date) -> tuple[date, date]:
+    end_date = today - timedelta(days=today.weekday() + 1)
+    return end_date - timedelta(days=6), end_date
+
+# Relative time phrases and the (start, end) range each maps to, in priority order
+_TIME_RANGES = {
+    'this month': lambda today: (today.replace(day=1), today),
+    'last month': _last_month,
+    'this week': lambda today: (today - timedelta(days=today.weekday()), today),
+    'last week': _last_week,
+    'this year': lambda today: (date(today.year, 1, 1), today),
+    'last year': lambda today: (date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)),
+    'last 30 days': lambda today: (today - timedelta(days=30), today),
+    'past month': lambda today: (today - timedelta(days=30), today),
+    'last 7 days': lambda today: (today - timedelta(days=7), today),
+    'past week': lambda today: (today - timedelta(days=7), today),
+}
+@lru_cache(maxsize=4)
+def _ranges_for(today: date) -> Dict[str, tuple[date, date]]:
+    """Every relative time range for the given day, computed once per day"""
+    return {phrase: compute(today) for phrase, compute in _TIME_RANGES.items()}
+
+_TIME_RANGE_PRIORITY = {phrase: priority for priority, phrase in enumerate(_TIME_RANGES)}
+# Every phrase in one alternation, found in a single pass over the query
+_TIME_RANGE_RE = re.compile('|'.join(re.escape(phrase) for phrase in _TIME_RANGES))
+
+# Strftime patterns for the time-period breakdowns
+_PERIOD_FORMATS = {"day": '%Y-%m-%d', "week": '%Y-W%U', "month": '%Y-%m', "year": '%Y'}
+
+def _category_totals(frame: pd.DataFrame) -> Dict[str, float]:
+    """Spending per category, in order of first appearance"""
+    if frame.empty:
+        return {}
+    spent = frame[frame['Amount'].notna()]
+    # observed=True: Category is a categorical spanning every user's categories
+    return spent.groupby('Category', sort=False, observed=True)['Amount'].sum().to_dict()
+
+def _series(breakdown: Dict[str, float]) -> Tuple[List[str], np.ndarray]:
+    """A breakdown's labels and its values as one float array, for charting and summary math"""
+    return list(breakdown), np.fromiter(breakdown.values(), dtype=np.float64, count=len(breakdown))
+
+def _aggregate_all(frame: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Every breakdown the analyses use, computed together: the rows are grouped by
+    category and by date, and the weekly, monthly and yearly totals are rolled up
+    from the much smaller daily series
+    """
+    if frame.empty:
+        return {"category": {}, "category_count": {}, "total": 0.0, "count": 0, **{period: {} for period in _PERIOD_FORMATS}}
+    
+    daily = frame.groupby('Date')['Amount'].sum()
+    aggregates = {
+        "category": _category_totals(frame),
+        "category_count": frame.groupby('Category', sort=False, observed=True).size().to_dict(),
+        "total": float(frame['Amount'].sum()),
+        "count": len(frame)
+    }
+    for period, date_format in _PERIOD_FORMATS.items():
+        aggregates[period] = daily.groupby(daily.index.strftime(date_format)).sum().to_dict()
+    return aggregates
+
+def _period_totals(aggregates: Dict[str, Any], period: str) -> Dict[str, float]:
+    """Spending per day, week, month or year, keyed by the formatted period"""
+    if period not in _PERIOD_FORMATS:
+        raise ValueError("Period must be one of: day, week, month, year")
+    return aggregates[period]
+
+# (expense frame, aggregates) keyed by ("frame", user_id, start_date, end_date), so analyses
+# of the same window share one Sheets read and one aggregation pass
+_frame_cache = TTLCache(maxsize=128, ttl=60)
+
+# Frame reads in progress by the same key, so concurrent misses share one Sheets read
+_frame_fetches: Dict[tuple, "asyncio.Future"] = {}
+
+# Rendered PNGs keyed by a digest of their chart spec
+_png_cache = TTLCache(maxsize=256, ttl=300)
+
+# PNGs handed out by URL, keyed by a random visualization id
+_visualization_cache = TTLCache(maxsize=256, ttl=600)
+
+async def _render_png_cached(spec: Dict[str, Any]) -> bytes:
+    """Rasterize a chart spec off the event loop, reusing recent renders of the same spec"""
+    key = blake2b(orjson.dumps(spec, option=orjson.OPT_SERIALIZE_NUMPY), digest_size=16).digest()
+    png = _png_cache.get(key)
+    if png is None:
+        png = await asyncio.to_thread(render_png, spec)
+        _png_cache[key] = png
+    return png
+
+def _cached_analysis(kind: str):
+    """
+    Cache an analysis method's result per (user, date range, options), so repeated
+    queries skip both the Sheets reads and chart rendering
+    """
+    def decorator(method):
+        @wraps(method)
+        async def wrapper(self, user_id: str, start_date: Optional[date], end_date: Optional[date], *options):
+            key = (
+                kind,
+                user_id,
+                start_date.isoformat() if start_date else None,
+                end_date.isoformat() if end_date else None,
+                *(tuple(option) if isinstance(option, list) else option for option in options)
+            )
+            result = _analysis_cache.get(key)
+            if result is None:
+                generation = _data_generations.get(user_id, 0)
+                result = await method(self, user_id, start_date, end_date, *options)
+                if _data_generations.get(user_id, 0) == generation:
+                    _analysis_cache[key] = result
+            # Callers add query metadata to the result, so hand out a copy
+            return dict(result)
+        return wrapper
+    return decorator
 
 class AnalyticsService:
-    def __init__(self):
-        self.sheets_service = GoogleSheetsService()
-        self.ai_service = GoogleAIService()
+    # Concurrent Sheets reads when comparing periods
+    PERIOD_FETCH_CONCURRENCY = 8
+    
+    @staticmethod
+    def invalidate(*user_ids: str):
+        """Drop cached analysis results for the given users after their expenses change"""
+        for user_id in user_ids:
+            _data_generations[user_id] = _data_generations.get(user_id, 0) + 1
+        # Reads in flight now may miss the write; later misses start a fresh read instead of joining them
+        for cache in (_analysis_cache, _frame_cache, _frame_fetches):
+            for key in [key for key in list(cache.keys()) if key[1] in user_ids]:
+                cache.pop(key, None)
     
-    async def answer_query(self, query: str, user_id: str = "default_user") -> Dict[str, Any]:
+    def __init__(self, sheets_service: Optional[GoogleSheetsService] = None, ai_service: Optional[GoogleAIService] = None):
+        # Reuse the app's shared service instances when given, so no extra Sheets client is opened
+        self.sheets_service = sheets_service or GoogleSheetsService()
+        self.ai_service = ai_service or shared_ai_service
+        # Analysis handlers by the parsed analysis_type
+        self._handlers = {
+            "comparison": self._handle_comparison_analysis,
+            "trend": self._handle_trend_analysis,
+            "category_breakdown": self._handle_category_analysis,
+            "total": self._handle_total_analysis,
+            "period_analysis": self._handle_period_analysis,
+        }
+        self._period_fetch_limit: Optional[asyncio.Semaphore] = None
+        self._period_fetch_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _get_period_fetch_limit(self) -> asyncio.Semaphore:
+        """Cap on concurrent per-period Sheets reads, created for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._period_fetch_loop is not loop:
+            self._period_fetch_limit = asyncio.Semaphore(self.PERIOD_FETCH_CONCURRENCY)
+            self._period_fetch_loop = loop
+        return self._period_fetch_limit
+    
+    def get_visualization(self, visualization_id: str) -> Optional[bytes]:
+        """PNG bytes for a visualization URL handed out by answer_query, if not yet expired"""
+        return _visualization_cache.get(visualization_id)
+    
+    async def _get_expense_data(self, user_id: str, start_date: Optional[date], end_date: Optional[date]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """
+        The user's expenses in the range, with a numeric Amount column, and their aggregates
+        from _aggregate_all, from one cached Sheets read
         """
-        Answer user queries about spending patterns using AI-powered parsing
+        key = ("frame", user_id, start_date, end_date)
+        cached = _frame_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        # Wait on a read already in flight for this window, e.g. from a batch or comparison
+        pending = _frame_fetches.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        
+        pending = asyncio.get_running_loop().create_future()
+        _frame_fetches[key] = pending
+        generation = _data_generations.get(user_id, 0)
+        try:
+            frame = await self.sheets_service.get_expenses_frame(user_id, start_date, end_date)
+            cached = (frame, _aggregate_all(frame))
+            if _data_generations.get(user_id, 0) == generation:
+                _frame_cache[key] = cached
+            pending.set_result(cached)
+            return cached
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            # Waiters re-raise it; mark it retrieved so an unwaited failure isn't logged
+            pending.exception()
+            raise
+        finally:
+            # invalidate() may have dropped this read already and a newer one taken its place
+            if _frame_fetches.get(key) is pending:
+                del _frame_fetches[key]
+    
+    async def _get_aggregates(self, user_id: str, start_date: Optional[date], end_date: Optional[date]) -> Dict[str, Any]:
+        return (await self._get_expense_data(user_id, start_date, end_date))[1]
+    
+    async def answer_query(self, query: str, user_id: str = "default_user", visualization_format: str = "plotly_json") -> Dict[str, Any]:
+        """
+        Answer user queries about spending patterns using AI-powered parsing.
+        The chart is returned as a Plotly figure spec to draw client-side, or rasterized
+        to a base64 PNG with "png" or a URL to the PNG with "png_url".
         """
         # Parse query using AI to understand intent and requirements
         parsed_query = await self.ai_service.parse_analytics_query(query)
         
-        # Route to appropriate analysis based on AI parsing results
-        if parsed_query["analysis_type"] == "comparison":
-            result = await self._handle_comparison_analysis(parsed_query, user_id)
-        elif parsed_query["analysis_type"] == "trend":
-            result = await self._handle_trend_analysis(parsed_query, user_id)
-        elif parsed_query["analysis_type"] == "category_breakdown":
-            result = await self._handle_category_analysis(parsed_query, user_id)
-        elif parsed_query["analysis_type"] == "total":
-            result = await self._handle_total_analysis(parsed_query, user_id)
-        elif parsed_query["analysis_type"] == "period_analysis":
-            result = await self._handle_period_analysis(parsed_query, user_id)
-        else:
-            # Default to category breakdown
-            result = await self._handle_category_analysis(parsed_query, user_id)
+        # Route to appropriate analysis based on AI parsing results, defaulting to category breakdown
+        handler = self._handlers.get(parsed_query["analysis_type"], self._handle_category_analysis)
+        result = await handler(parsed_query, user_id)
+        
+        # Analyses describe their chart as a spec; rasterize it only for PNG consumers
+        spec = result.get("visualization")
+        result["visualization_url"] = None
+        if spec is not None and visualization_format == "png":
+            # Raw PNG bytes; the JSON response encodes them to base64
+            result["visualization"] = await _render_png_cached(spec)
+        elif spec is not None and visualization_format == "png_url":
+            # Serve the image separately instead of inlining it as base64
+            visualization_id = uuid.uuid4().hex
+            _visualization_cache[visualization_id] = await _render_png_cached(spec)
+            result["visualization"] = None
+            result["visualization_url"] = f"/api/v1/viz/{visualization_id}"
+        elif spec is not None and visualization_format == "plotly_json":
+            result["visualization"] = to_plotly_json(spec)
+        result["visualization_format"] = visualization_format if spec is not None else None
         
         # Add query metadata to the result
         result["query"] = query
@@ -44,11 +270,19 @@ class AnalyticsService:
         # Extract date range from time periods if available
         if parsed_query.get("time_periods") and len(parsed_query["time_periods"]) > 0:
             first_period = parsed_query["time_periods"][0]
-            result["start_date"] = first_period.get("start_date")
-            result["end_date"] = first_period.get("end_date")
+            result["start_date"] = self._parse_date(first_period.get("start_date"))
+            result["end_date"] = self._parse_date(first_period.get("end_date"))
         
         return result
     
+    async def answer_queries(self, queries: List[str], user_id: str = "default_user", visualization_format: str = "plotly_json") -> List[Dict[str, Any]]:
+        """
+        Answer several queries concurrently, e.g. for a dashboard; results are in query order
+        """
+        return await asyncio.gather(*(
+            self.answer_query(query, user_id, visualization_format) for query in queries
+        ))
+    
     async def _handle_comparison_analysis(self, parsed_query: Dict[str, Any], user_id: str) -> Dict[str, Any]:
         """Handle comparison-based analysis"""
         comparison_type = parsed_query.get("comparison_type")
@@ -129,35 +363,50 @@ class AnalyticsService:
         """Parse date string to date object"""
         if not date_str:
             return None
+        try:
+            # Plain YYYY-MM-DD dates, the usual form, parse without building a datetime
+            return date.fromisoformat(date_str)
+        except ValueError:
+            pass
         try:
             return datetime.fromisoformat(date_str).date()
         except ValueError:
             return None
     
+    async def _get_period_aggregates(self, time_periods: List[Dict], user_id: str) -> List[Tuple[Optional[date], Optional[date], Dict[str, Any]]]:
+        """
+        (start_date, end_date, aggregates) for each period, with the Sheets reads
+        for all periods issued concurrently
+        """
+        async def fetch(period: Dict) -> Tuple[Optional[date], Optional[date], Dict[str, Any]]:
+            start_date = self._parse_date(period.get("start_date"))
+            end_date = self._parse_date(period.get("end_date"))
+            # Bound the fan-out so a long period list doesn't exhaust the Sheets read quota
+            async with self._get_period_fetch_limit():
+                aggregates = await self._get_aggregates(user_id, start_date, end_date)
+            return start_date, end_date, aggregates
+        
+        return await asyncio.gather(*(fetch(period) for period in time_periods))
+    
     async def _compare_time_periods(self, time_periods: List[Dict], user_id: str, parsed_query: Dict) -> Dict[str, Any]:
         """Compare spending across multiple time periods"""
         period_data = []
         
-        for period in time_periods:
-            start_date = self._parse_date(period.get("start_date"))
-            end_date = self._parse_date(period.get("end_date"))
-            
-            # Get spending data for this period
-            total_spending = await self.sheets_service.get_total_spending(user_id, start_date, end_date)
-            expenses = await self.sheets_service.get_expenses(user_id, start_date, end_date)
+        for period, (start_date, end_date, aggregates) in zip(time_periods, await self._get_period_aggregates(time_periods, user_id)):
+            # Get spending data for this period from one frame
+            total_spending = aggregates["total"]
+            transaction_count = aggregates["count"]
             
             # Get category breakdown if requested
-            category_data = None
-            if parsed_query.get("include_category_breakdown", False):
-                category_data = await self.sheets_service.get_spending_by_category(user_id, start_date, end_date)
+            category_data = aggregates["category"] if parsed_query.get("include_category_breakdown", False) else None
             
             period_data.append({
                 "label": period.get("label", f"{start_date} to {end_date}"),
                 "start_date": start_date.isoformat() if start_date else None,
                 "end_date": end_date.isoformat() if end_date else None,
                 "total_spending": total_spending,
-                "transaction_count": len(expenses),
-                "average_per_transaction": total_spending / len(expenses) if expenses else 0,
+                "transaction_count": transaction_count,
+                "average_per_transaction": total_spending / transaction_count if transaction_count else 0,
                 "category_breakdown": category_data
             })
         
@@ -182,12 +431,9 @@ class AnalyticsService:
         """Compare categories across time periods"""
         comparison_data = []
         
-        for period in time_periods:
-            start_date = self._parse_date(period.get("start_date"))
-            end_date = self._parse_date(period.get("end_date"))
-            
+        for period, (start_date, end_date, aggregates) in zip(time_periods, await self._get_period_aggregates(time_periods, user_id)):
             # Get category breakdown for this period
-            category_spending = await self.sheets_service.get_spending_by_category(user_id, start_date, end_date)
+            category_spending = aggregates["category"]
             
             # Filter by specific categories if requested
             if categories:
@@ -200,91 +446,51 @@ class AnalyticsService:
                 "categories": category_spending
             })
         
-        # Create side-by-side comparison chart
-        visualization = self._create_category_comparison_chart(comparison_data)
+        # Every category seen in any period, in order of first appearance, shared by the chart and insights
+        all_categories = list(dict.fromkeys(cat for period_data in comparison_data for cat in period_data["categories"]))
+        
+        # Create side-by-side comparison chart straight from the per-period dicts
+        visualization = self._create_category_comparison_chart(comparison_data, all_categories)
+        
+        # One row per period and one column per category, for the vectorised insights
+        amounts = pd.DataFrame(
+            [period_data["categories"] for period_data in comparison_data],
+            index=[period_data["period"] for period_data in comparison_data],
+            columns=all_categories,
+            dtype=np.float64
+        ).fillna(0.0)
         
         return {
             "message": f"Category comparison across {len(comparison_data)} periods",
             "analysis_type": "category_comparison",
             "data": {
                 "periods": comparison_data,
-                "insights": self._generate_category_comparison_insights(comparison_data)
+                "insights": self._generate_category_comparison_insights(amounts)
             },
             "visualization": visualization
         }
     
-    def _create_comparison_chart(self, period_data: List[Dict], chart_type: str) -> str:
+    def _create_comparison_chart(self, period_data: List[Dict], chart_type: str) -> Dict[str, Any]:
         """Create comparison visualization"""
+        labels = [period["label"] for period in period_data]
+        values = [period["total_spending"] for period in period_data]
+        
         if chart_type == "side_by_side":
-            # Create side-by-side bar chart
-            labels = [period["label"] for period in period_data]
-            values = [period["total_spending"] for period in period_data]
-            
-            fig = go.Figure()
-            fig.add_trace(go.Bar(
-                x=labels,
-                y=values,
-                name="Total Spending",
-                text=[f"${val:.2f}" for val in values],
-                textposition='auto'
-            ))
-            
-            fig.update_layout(
-                title="Spending Comparison Across Periods",
-                xaxis_title="Time Periods",
-                yaxis_title="Amount ($)"
-            )
-        else:
-            # Default comparison bar chart
-            labels = [period["label"] for period in period_data]
-            values = [period["total_spending"] for period in period_data]
-            
-            fig = px.bar(
-                x=labels,
-                y=values,
-                title="Period Spending Comparison",
-                labels={'x': 'Time Periods', 'y': 'Amount ($)'}
-            )
+            # Side-by-side bar chart with the amount on each bar
+            return bar_spec(labels, values, "Spending Comparison Across Periods", "Time Periods", "Amount ($)", annotate=True)
         
-        # Convert to base64
-        img_bytes = fig.to_image(format="png")
-        img_base64 = base64.b64encode(img_bytes).decode()
-        return img_base64
+        # Default comparison bar chart
+        return bar_spec(labels, values, "Period Spending Comparison", "Time Periods", "Amount ($)")
     
-    def _create_category_comparison_chart(self, comparison_data: List[Dict]) -> str:
-        """Create category comparison chart across periods"""
-        # Prepare data for grouped bar chart
-        all_categories = set()
-        for period_data in comparison_data:
-            all_categories.update(period_data["categories"].keys())
-        
-        fig = go.Figure()
-        
-        # Add a bar trace for each period
-        for period_data in comparison_data:
-            period_name = period_data["period"]
-            categories = [cat for cat in all_categories]
-            values = [period_data["categories"].get(cat, 0) for cat in categories]
-            
-            fig.add_trace(go.Bar(
-                name=period_name,
-                x=categories,
-                y=values,
-                text=[f"${val:.2f}" for val in values],
-                textposition='auto'
-            ))
-        
-        fig.update_layout(
-            title="Category Spending Comparison Across Periods",
-            xaxis_title="Categories",
-            yaxis_title="Amount ($)",
-            barmode='group'
-        )
-        
-        # Convert to base64
-        img_bytes = fig.to_image(format="png")
-        img_base64 = base64.b64encode(img_bytes).decode()
-        return img_base64
+    def _create_category_comparison_chart(self, comparison_data: List[Dict], all_categories: List[str]) -> Dict[str, Any]:
+        """Create category comparison chart from each period's category totals"""
+        # One bar series per period, by position so periods sharing a label stay separate
+        series = [
+            (period_data["period"], [float(period_data["categories"].get(cat, 0.0)) for cat in all_categories])
+            for period_data in comparison_data
+        ]
+        
+        return grouped_bar_spec(all_categories, series, "Category Spending Comparison Across Periods", "Categories", "Amount ($)")
     
     def _generate_comparison_insights(self, period_data: List[Dict]) -> List[str]:
         """Generate insights from period comparison"""
@@ -294,115 +500,64 @@ class AnalyticsService:
             return insights
         
         # Compare spending between periods
-        amounts = [p["total_spending"] for p in period_data]
-        if len(amounts) >= 2:
-            diff = amounts[1] - amounts[0]
-            percent_change = (diff / amounts[0] * 100) if amounts[0] > 0 else 0
-            
-            if diff > 0:
-                insights.append(f"Spending increased by ${diff:.2f} ({percent_change:.1f}%) between periods")
-            elif diff < 0:
-                insights.append(f"Spending decreased by ${abs(diff):.2f} ({abs(percent_change):.1f}%) between periods")
-            else:
-                insights.append("Spending remained the same between periods")
+        amounts = np.fromiter((p["total_spending"] for p in period_data), dtype=np.float64, count=len(period_data))
+        diff = float(amounts[1] - amounts[0])
+        percent_change = (diff / amounts[0] * 100) if amounts[0] > 0 else 0
+        
+        if diff > 0:
+            insights.append(f"Spending increased by ${diff:.2f} ({percent_change:.1f}%) between periods")
+        elif diff < 0:
+            insights.append(f"Spending decreased by ${abs(diff):.2f} ({abs(percent_change):.1f}%) between periods")
+        else:
+            insights.append("Spending remained the same between periods")
         
         # Find highest and lowest spending periods
-        max_period = max(period_data, key=lambda x: x["total_spending"])
-        min_period = min(period_data, key=lambda x: x["total_spending"])
+        max_index, min_index = int(amounts.argmax()), int(amounts.argmin())
+        max_period, min_period = period_data[max_index], period_data[min_index]
         
-        if max_period != min_period:
+        if max_index != min_index:
             insights.append(f"Highest spending: {max_period['label']} (${max_period['total_spending']:.2f})")
             insights.append(f"Lowest spending: {min_period['label']} (${min_period['total_spending']:.2f})")
         
         return insights
     
-    def _generate_category_comparison_insights(self, comparison_data: List[Dict]) -> List[str]:
-        """Generate insights from category comparison"""
+    def _generate_category_comparison_insights(self, amounts: pd.DataFrame) -> List[str]:
+        """Generate insights from the period-by-category amounts"""
         insights = []
         
-        if len(comparison_data) < 2:
+        if len(amounts) < 2:
             return insights
         
-        # Find categories with biggest changes
-        all_categories = set()
-        for period in comparison_data:
-            all_categories.update(period["categories"].keys())
+        # Find categories with biggest changes between the first two periods
+        first, second = amounts.iloc[0], amounts.iloc[1]
+        percent_change = (second - first) / first.where(first > 0) * 100
         
-        for category in all_categories:
-            amounts = [period["categories"].get(category, 0) for period in comparison_data]
-            if len(amounts) >= 2 and amounts[0] > 0:
-                diff = amounts[1] - amounts[0]
-                percent_change = (diff / amounts[0] * 100)
-                
-                if abs(percent_change) > 20:  # Significant change
-                    if diff > 0:
-                        insights.append(f"{category.title()} spending increased by {percent_change:.1f}%")
-                    else:
-                        insights.append(f"{category.title()} spending decreased by {abs(percent_change):.1f}%")
+        for category, change in percent_change[percent_change.abs() > 20].items():  # Significant change
+            if change > 0:
+                insights.append(f"{category.title()} spending increased by {change:.1f}%")
+            else:
+                insights.append(f"{category.title()} spending decreased by {abs(change):.1f}%")
         
         return insights
     
     def _parse_time_range(self, query: str) -> tuple[Optional[date], Optional[date]]:
         """Parse time range from query"""
-        today = date.today()
-        
-        if 'this month' in query:
-            start_date = today.replace(day=1)
-            return start_date, today
-        
-        elif 'last month' in query:
-            if today.month == 1:
-                start_date = date(today.year - 1, 12, 1)
-                end_date = date(today.year - 1, 12, 31)
-            else:
-                start_date = date(today.year, today.month - 1, 1)
-                # Get last day of previous month
-                end_date = today.replace(day=1) - timedelta(days=1)
-            return start_date, end_date
-        
-        elif 'this week' in query:
-            days_since_monday = today.weekday()
-            start_date = today - timedelta(days=days_since_monday)
-            return start_date, today
-        
-        elif 'last week' in query:
-            days_since_monday = today.weekday()
-            end_date = today - timedelta(days=days_since_monday + 1)
-            start_date = end_date - timedelta(days=6)
-            return start_date, end_date
-        
-        elif 'this year' in query:
-            start_date = date(today.year, 1, 1)
-            return start_date, today
-        
-        elif 'last year' in query:
-            start_date = date(today.year - 1, 1, 1)
-            end_date = date(today.year - 1, 12, 31)
-            return start_date, end_date
-        
-        elif 'last 30 days' in query or 'past month' in query:
-            start_date = today - timedelta(days=30)
-            return start_date, today
-        
-        elif 'last 7 days' in query or 'past week' in query:
-            start_date = today - timedelta(days=7)
-            return start_date, today
-        
-        # Default: no time filter
-        return None, None
+        # Several phrases may appear; the one listed first in _TIME_RANGES wins
+        phrases = _TIME_RANGE_RE.findall(query.lower())
+        if not phrases:
+            # Default: no time filter
+            return None, None
+        
+        phrase = min(phrases, key=_TIME_RANGE_PRIORITY.__getitem__)
+        return _ranges_for(date.today())[phrase]
     
+    @_cached_analysis("category")
     async def _category_analysis(self, user_id: str, start_date: Optional[date], end_date: Optional[date], categories: Optional[List[str]] = None) -> Dict[str, Any]:
         """Analyze spending by category with optional category filtering"""
-        category_spending = await self.sheets_service.get_spending_by_category(
-            user_id, start_date, end_date
-        )
+        category_spending = (await self._get_aggregates(user_id, start_date, end_date))["category"]
         
         if not category_spending:
-            return {
-                "message": "No expenses found for the specified period.",
-                "data": {},
-                "visualization": None
-            }
+            return _NO_EXPENSES
         
         # Filter by specific categories if requested
         if categories:
@@ -410,17 +565,9 @@ class AnalyticsService:
         
         # Create pie chart
         if category_spending:
-            fig = px.pie(
-                values=list(category_spending.values()),
-                names=list(category_spending.keys()),
-                title="Spending by Category"
-            )
-            
-            # Convert to base64
-            img_bytes = fig.to_image(format="png")
-            img_base64 = base64.b64encode(img_bytes).decode()
+            chart = pie_spec(list(category_spending.keys()), list(category_spending.values()), "Spending by Category")
         else:
-            img_base64 = None
+            chart = None
         
         total_spending = sum(category_spending.values())
         
@@ -430,127 +577,102 @@ class AnalyticsService:
                 "category_breakdown": category_spending,
                 "total": total_spending
             },
-            "visualization": img_base64
+            "visualization": chart
         }
     
+    @_cached_analysis("monthly")
     async def _monthly_analysis(self, user_id: str, start_date: Optional[date], end_date: Optional[date]) -> Dict[str, Any]:
         """Analyze monthly spending patterns"""
-        monthly_spending = await self.sheets_service.get_spending_by_time_period(
-            user_id, "month", start_date, end_date
-        )
+        monthly_spending = _period_totals(await self._get_aggregates(user_id, start_date, end_date), "month")
         
         if not monthly_spending:
-            return {
-                "message": "No expenses found for the specified period.",
-                "data": {},
-                "visualization": None
-            }
+            return _NO_EXPENSES
         
         # Create bar chart
-        fig = px.bar(
-            x=list(monthly_spending.keys()),
-            y=list(monthly_spending.values()),
-            title="Monthly Spending",
-            labels={'x': 'Month', 'y': 'Amount ($)'}
+        labels, values = _series(monthly_spending)
+        chart = bar_spec(
+            labels,
+            values,
+            "Monthly Spending",
+            "Month",
+            "Amount ($)"
         )
         
-        # Convert to base64
-        img_bytes = fig.to_image(format="png")
-        img_base64 = base64.b64encode(img_bytes).decode()
-        
         return {
             "message": "Monthly spending analysis",
             "data": {
                 "monthly_breakdown": monthly_spending,
-                "average_monthly": sum(monthly_spending.values()) / len(monthly_spending)
+                "average_monthly": float(values.mean())
             },
-            "visualization": img_base64
+            "visualization": chart
         }
     
+    @_cached_analysis("weekly")
     async def _weekly_analysis(self, user_id: str, start_date: Optional[date], end_date: Optional[date]) -> Dict[str, Any]:
         """Analyze weekly spending patterns"""
-        weekly_spending = await self.sheets_service.get_spending_by_time_period(
-            user_id, "week", start_date, end_date
-        )
+        weekly_spending = _period_totals(await self._get_aggregates(user_id, start_date, end_date), "week")
         
         if not weekly_spending:
-            return {
-                "message": "No expenses found for the specified period.",
-                "data": {},
-                "visualization": None
-            }
+            return _NO_EXPENSES
         
         # Create line chart
-        fig = px.line(
-            x=list(weekly_spending.keys()),
-            y=list(weekly_spending.values()),
-            title="Weekly Spending Trend",
-            labels={'x': 'Week', 'y': 'Amount ($)'}
+        labels, values = _series(weekly_spending)
+        chart = line_spec(
+            labels,
+            values,
+            "Weekly Spending Trend",
+            "Week",
+            "Amount ($)"
         )
         
-        # Convert to base64
-        img_bytes = fig.to_image(format="png")
-        img_base64 = base64.b64encode(img_bytes).decode()
-        
         return {
             "message": "Weekly spending analysis",
             "data": {
                 "weekly_breakdown": weekly_spending,
-                "average_weekly": sum(weekly_spending.values()) / len(weekly_spending)
+                "average_weekly": float(values.mean())
             },
-            "visualization": img_base64
+            "visualization": chart
         }
     
+    @_cached_analysis("yearly")
     async def _yearly_analysis(self, user_id: str, start_date: Optional[date], end_date: Optional[date]) -> Dict[str, Any]:
         """Analyze yearly spending patterns"""
-        yearly_spending = await self.sheets_service.get_spending_by_time_period(
-            user_id, "year", start_date, end_date
-        )
+        yearly_spending = _period_totals(await self._get_aggregates(user_id, start_date, end_date), "year")
         
         if not yearly_spending:
-            return {
-                "message": "No expenses found for the specified period.",
-                "data": {},
-                "visualization": None
-            }
+            return _NO_EXPENSES
         
         # Create bar chart
-        fig = px.bar(
-            x=list(yearly_spending.keys()),
-            y=list(yearly_spending.values()),
-            title="Yearly Spending",
-            labels={'x': 'Year', 'y': 'Amount ($)'}
+        labels, values = _series(yearly_spending)
+        chart = bar_spec(
+            labels,
+            values,
+            "Yearly Spending",
+            "Year",
+            "Amount ($)"
         )
         
-        # Convert to base64
-        img_bytes = fig.to_image(format="png")
-        img_base64 = base64.b64encode(img_bytes).decode()
-        
         return {
             "message": "Yearly spending analysis",
             "data": {
                 "yearly_breakdown": yearly_spending,
-                "average_yearly": sum(yearly_spending.values()) / len(yearly_spending)
+                "average_yearly": float(values.mean())
             },
-            "visualization": img_base64
+            "visualization": chart
         }
     
+    @_cached_analysis("total_spending")
     async def _total_spending_analysis(self, user_id: str, start_date: Optional[date], end_date: Optional[date], categories: Optional[List[str]] = None) -> Dict[str, Any]:
         """Analyze total spending with optional category filtering"""
+        aggregates = await self._get_aggregates(user_id, start_date, end_date)
+        total = aggregates["total"]
+        transaction_count = aggregates["count"]
         if categories:
-            # If specific categories requested, get category breakdown and sum only those
-            category_spending = await self.sheets_service.get_spending_by_category(user_id, start_date, end_date)
-            total = sum(category_spending.get(cat, 0) for cat in categories)
-            expenses = await self.sheets_service.get_expenses(user_id, start_date, end_date)
-            # Filter expenses by category
-            filtered_expenses = []
-            for expense in expenses:
-                if expense.get('Category', '').lower() in [cat.lower() for cat in categories]:
-                    filtered_expenses.append(expense)
-            expenses = filtered_expenses
-        else:
-            total = await self.sheets_service.get_total_spending(user_id, start_date, end_date)
-            expenses = await self.sheets_service.get_expenses(user_id, start_date, end_date)
+            # If specific categories requested, sum only those, from the per-category totals
+            wanted = {cat.lower() for cat in categories}
+            matched = [category for category in aggregates["category_count"] if category.lower() in wanted]
+            total = float(sum(aggregates["category"].get(category, 0.0) for category in matched))
+            transaction_count = sum(aggregates["category_count"][category] for category in matched)
         
         period = "all time"
         if start_date and end_date:
@@ -568,62 +690,56 @@ class AnalyticsService:
             "message": f"Total spending{category_msg} {period}: ${total:.2f}",
             "data": {
                 "total_amount": total,
-                "transaction_count": len(expenses),
-                "average_per_transaction": total / len(expenses) if expenses else 0,
+                "transaction_count": transaction_count,
+                "average_per_transaction": total / transaction_count if transaction_count else 0,
                 "filtered_categories": categories
             },
             "visualization": None
         }
     
+    @_cached_analysis("trend")
     async def _trend_analysis(self, user_id: str, start_date: Optional[date], end_date: Optional[date], granularity: str = "day") -> Dict[str, Any]:
         """Analyze spending trends over time with configurable granularity"""
-        spending_data = await self.sheets_service.get_spending_by_time_period(
-            user_id, granularity, start_date, end_date
-        )
+        spending_data = _period_totals(await self._get_aggregates(user_id, start_date, end_date), granularity)
         
         if not spending_data:
-            return {
-                "message": "No expenses found for the specified period.",
-                "data": {},
-                "visualization": None
-            }
-        
-        # Create line chart for trend
-        fig = px.line(
-            x=list(spending_data.keys()),
-            y=list(spending_data.values()),
-            title=f"{granularity.title()} Spending Trend",
-            labels={'x': granularity.title(), 'y': 'Amount ($)'}
+            return _NO_EXPENSES
+        
+        # Create line chart for trend, downsampled for long ranges (the data keeps every point)
+        dates, amounts = _series(spending_data)
+        keep = np.asarray(downsample_indices(amounts))
+        chart = line_spec(
+            [dates[i] for i in keep],
+            amounts[keep],
+            f"{granularity.title()} Spending Trend",
+            granularity.title(),
+            "Amount ($)",
+            name="Spending"
         )
         
         # Add trend line for daily data
         if granularity == "day":
-            dates = list(spending_data.keys())
-            amounts = list(spending_data.values())
-            
             # Calculate simple moving average
-            if len(amounts) >= 7:
-                ma_7 = []
-                for i in range(6, len(amounts)):
-                    ma_7.append(sum(amounts[i-6:i+1]) / 7)
+            if amounts.size >= 7:
+                ma_7 = rolling_mean(amounts, 7)
                 
-                fig.add_trace(go.Scatter(
-                    x=dates[6:],
-                    y=ma_7,
-                    name="7-day Moving Average",
-                    line=dict(color='red', width=2)
-                ))
-        
-        # Convert to base64
-        img_bytes = fig.to_image(format="png")
-        img_base64 = base64.b64encode(img_bytes).decode()
+                # Sample the moving average at the same points as the spending line
+                ma_keep = keep[keep >= 6]
+                chart["data"].append({
+                    "type": line_trace_type(ma_keep.size),
+                    "mode": "lines",
+                    "x": [dates[i] for i in ma_keep],
+                    "y": ma_7[ma_keep - 6],
+                    "name": "7-day Moving Average",
+                    "line": {"color": "red", "width": 2}
+                })
         
         return {
             "message": f"Spending trend analysis by {granularity}",
             "data": {
                 f"{granularity}_breakdown": spending_data,
                 f"total_{granularity}s": len(spending_data),
-                f"average_{granularity}ly": sum(spending_data.values()) / len(spending_data)
+                f"average_{granularity}ly": float(amounts.mean())
             },
-            "visualization": img_base64
+            "visualization": chart
         }
@@ -1,42 +1,54 @@
-from datetime import datetime, timedelta
+import hmac
+import time
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+import jwt
 from fastapi import HTTPException, status
-from app.core.config import settings
+from app.core.config import get_settings
 
-# Password context for hashing (though we're using static password)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Claims of every token issued by authenticate; create_access_token adds exp without mutating them
+_ACCESS_TOKEN_CLAIMS = {"sub": "default_user", "type": "access"}
 
 class AuthService:
     def __init__(self):
+        settings = get_settings()
         self.secret_key = settings.jwt_secret_key
         self.algorithm = settings.jwt_algorithm
+        # Key bytes and algorithm list are reused by every token check
+        self._key_bytes = self.secret_key.encode()
+        self._algorithms = [self.algorithm]
         self.access_token_expire_minutes = settings.access_token_expire_minutes
+        self._expire_seconds = self.access_token_expire_minutes * 60
+        self._password_bytes = settings.static_password.encode()
         
     def verify_password(self, password: str) -> bool:
         """Verify if the provided password matches the static password"""
-        return password == settings.static_password
+        # Constant-time comparison, so response timing doesn't reveal how much of the password matched
+        return hmac.compare_digest(password.encode(), self._password_bytes)
     
     def create_access_token(self, data: dict) -> str:
         """Create JWT access token"""
-        to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(minutes=self.access_token_expire_minutes)
-        to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
+        # Epoch seconds, the form the exp claim is encoded in anyway
+        to_encode = {**data, "exp": int(time.time()) + self._expire_seconds}
+        encoded_jwt = jwt.encode(to_encode, self._key_bytes, algorithm=self.algorithm)
         return encoded_jwt
     
+    def try_verify_token(self, token: str) -> Optional[dict]:
+        """Verify JWT token and return payload, or None if it is invalid"""
+        try:
+            return jwt.decode(token, self._key_bytes, algorithms=self._algorithms, options={"require": ["exp"]})
+        except jwt.InvalidTokenError:
+            return None
+    
     def verify_token(self, token: str) -> dict:
         """Verify JWT token and return payload"""
-        try:
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            return payload
-        except JWTError:
+        payload = self.try_verify_token(token)
+        if payload is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        return payload
     
     def authenticate(self, password: str) -> Optional[str]:
         """Authenticate user with static password and return access token"""
@@ -44,9 +56,7 @@ class AuthService:
             return None
         
         # Create token with basic user info
-        access_token_data = {"sub": "default_user", "type": "access"}
-        access_token = self.create_access_token(access_token_data)
-        return access_token
+        return self.create_access_token(_ACCESS_TOKEN_CLAIMS)
 
 # Create global auth service instance
 auth_service = AuthService()
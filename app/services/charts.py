@@ -0,0 +1,166 @@
+import base64
+import io
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Charts are described as Plotly figure JSON ({"data": [...], "layout": {...}}), which clients
+# can draw directly with Plotly.newPlot. PNGs are rasterized from the same spec in-process with
+# matplotlib's Agg canvas, only when a client asks for an image; matplotlib is imported on the
+# first render, so workers that only serve JSON never load it.
+CHART_SIZE = (8, 5)
+CHART_DPI = 100
+CHART_MAX_XTICKS = 12
+# Line series longer than this are downsampled; a chart can't show more points than it has pixels
+CHART_MAX_POINTS = 1000
+# Line series longer than this are drawn with WebGL (scattergl) instead of SVG on the client
+CHART_WEBGL_POINTS = 500
+
+def _layout(title: str, xlabel: Optional[str] = None, ylabel: Optional[str] = None, **extra: Any) -> Dict[str, Any]:
+    """Plotly layout with a title and optional axis titles"""
+    layout = {"title": {"text": title}, **extra}
+    if xlabel:
+        layout["xaxis"] = {"title": {"text": xlabel}}
+    if ylabel:
+        layout["yaxis"] = {"title": {"text": ylabel}}
+    return layout
+
+def _amount_labels(values: List[float]) -> List[str]:
+    return [f"${value:.2f}" for value in values]
+
+def bar_spec(labels: List[str], values: List[float], title: str, xlabel: str, ylabel: str, annotate: bool = False) -> Dict[str, Any]:
+    """Bar chart spec, optionally with the amount on each bar"""
+    trace = {"type": "bar", "x": labels, "y": values}
+    if annotate:
+        trace.update(text=_amount_labels(values), textposition="auto")
+    return {"data": [trace], "layout": _layout(title, xlabel, ylabel)}
+
+def grouped_bar_spec(categories: List[str], series: Sequence[Tuple[str, List[float]]], title: str, xlabel: str, ylabel: str) -> Dict[str, Any]:
+    """Grouped bar chart spec with one named bar trace per (name, values) series, in order"""
+    return {
+        "data": [
+            {"type": "bar", "name": name, "x": categories, "y": values, "text": _amount_labels(values), "textposition": "auto"}
+            for name, values in series
+        ],
+        "layout": _layout(title, xlabel, ylabel, barmode="group")
+    }
+
+def line_trace_type(points: int) -> str:
+    """Plotly trace type for a line of this many points"""
+    return "scattergl" if points > CHART_WEBGL_POINTS else "scatter"
+
+def line_spec(labels: List[str], values: List[float], title: str, xlabel: str, ylabel: str, name: Optional[str] = None) -> Dict[str, Any]:
+    """Line chart spec, using WebGL for long series"""
+    trace = {"type": line_trace_type(len(values)), "mode": "lines", "x": labels, "y": values}
+    if name:
+        trace["name"] = name
+    return {"data": [trace], "layout": _layout(title, xlabel, ylabel)}
+
+def pie_spec(labels: List[str], values: List[float], title: str) -> Dict[str, Any]:
+    """Pie chart spec"""
+    return {"data": [{"type": "pie", "labels": labels, "values": values}], "layout": _layout(title)}
+
+def _typed_array(values: np.ndarray) -> Dict[str, str]:
+    """Plotly.js typed-array form of a float array: base64 of its little-endian float64 bytes"""
+    return {"dtype": "f8", "bdata": base64.b64encode(values.astype("<f8", copy=False).tobytes()).decode()}
+
+def to_plotly_json(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy of a spec for clients, with numeric numpy arrays in the traces encoded as base64
+    typed arrays (as Plotly.py 6 does), which are smaller and faster to load than JSON numbers
+    """
+    return {
+        **spec,
+        "data": [
+            {
+                key: _typed_array(value) if isinstance(value, np.ndarray) and value.dtype.kind == "f" else value
+                for key, value in trace.items()
+            }
+            for trace in spec["data"]
+        ]
+    }
+
+def downsample_indices(values: Sequence[float], threshold: int = CHART_MAX_POINTS) -> List[int]:
+    """
+    Indices of the points to keep when plotting a long series, chosen with
+    Largest-Triangle-Three-Buckets so peaks and dips survive. Short series are kept whole.
+    """
+    count = len(values)
+    if count <= threshold or threshold < 3:
+        return list(range(count))
+
+    y = np.asarray(values, dtype=np.float64)
+    bucket_size = (count - 2) / (threshold - 2)
+    indices = [0]
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+
+        # Pick the point forming the largest triangle with the previous pick and the next bucket's average
+        next_x = (end + next_end - 1) / 2
+        next_y = y[end:next_end].mean()
+        candidates = np.arange(start, end)
+        areas = np.abs((previous - next_x) * (y[start:end] - y[previous]) - (previous - candidates) * (next_y - y[previous]))
+        previous = start + int(areas.argmax())
+        indices.append(previous)
+
+    indices.append(count - 1)
+    return indices
+
+def _axis_title(layout: Dict[str, Any], axis: str) -> Optional[str]:
+    return layout.get(axis, {}).get("title", {}).get("text")
+
+def render_png(spec: Dict[str, Any]) -> bytes:
+    """Rasterize a chart spec to PNG bytes"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.ticker import MaxNLocator
+
+    layout = spec.get("layout", {})
+    traces = spec["data"]
+
+    fig = Figure(figsize=CHART_SIZE, dpi=CHART_DPI, layout="constrained")
+    ax = fig.subplots()
+    ax.set_title(layout.get("title", {}).get("text", ""))
+
+    if traces and traces[0]["type"] == "pie":
+        ax.pie(traces[0]["values"], labels=traces[0]["labels"], autopct="%1.1f%%")
+    else:
+        bars = [trace for trace in traces if trace["type"] == "bar"]
+        grouped = layout.get("barmode") == "group" and len(bars) > 1
+        width = 0.8 / len(bars) if grouped else 0.8
+
+        for index, trace in enumerate(traces):
+            if trace["type"] == "bar":
+                if grouped:
+                    # Offset each series within its category slot
+                    positions = [slot + (index - (len(bars) - 1) / 2) * width for slot in range(len(trace["x"]))]
+                    drawn = ax.bar(positions, trace["y"], width, label=trace.get("name"))
+                else:
+                    drawn = ax.bar(trace["x"], trace["y"], width, label=trace.get("name"))
+                if "text" in trace:
+                    ax.bar_label(drawn, labels=trace["text"], fontsize=7 if grouped else None)
+            else:
+                line = trace.get("line", {})
+                ax.plot(trace["x"], trace["y"], label=trace.get("name"), color=line.get("color"), linewidth=line.get("width"))
+
+        if grouped:
+            ax.set_xticks(range(len(bars[0]["x"])), bars[0]["x"])
+        if sum(1 for trace in traces if trace.get("name")) > 1:
+            ax.legend()
+
+        if _axis_title(layout, "xaxis"):
+            ax.set_xlabel(_axis_title(layout, "xaxis"))
+        if _axis_title(layout, "yaxis"):
+            ax.set_ylabel(_axis_title(layout, "yaxis"))
+
+        # Keep long categorical x axes readable
+        points = max((len(trace["x"]) for trace in traces), default=0)
+        if points > CHART_MAX_XTICKS:
+            ax.xaxis.set_major_locator(MaxNLocator(CHART_MAX_XTICKS))
+            ax.tick_params(axis="x", labelrotation=45)
+
+    buffer = io.BytesIO()
+    FigureCanvasAgg(fig).print_png(buffer)
+    return buffer.getvalue()
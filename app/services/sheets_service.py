@@ -1,139 +1,386 @@
+import asyncio
+import importlib.util
+import logging
+import re
+import time
 import gspread
 from google.oauth2.service_account import Credentials
+from google.auth.transport.requests import Request as GoogleAuthRequest
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any, Optional
-from datetime import datetime, date
-from app.core.config import settings
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+from datetime import datetime, date, timezone
+from app.core.config import get_settings
+from app.core.http import pooled_session, RetryingHTTPClient, GOOGLE_API_TIMEOUT
 from app.models.expense import ParsedExpense
 
+logger = logging.getLogger(__name__)
+
+# Columns searched after Description, in the order their text is joined
+_SEARCH_COLUMNS = ['Category', 'Subcategory', 'Tags', 'Notes']
+
+# Sheet columns, in the order _build_row writes them
+EXPECTED_HEADERS = (
+    'Timestamp', 'Date', 'Time', 'Amount', 'Currency',
+    'Category', 'Subcategory', 'Description', 'Tags',
+    'Location', 'Payment Method', 'Notes', 'User ID'
+)
+# A1 letter of the last column ("M")
+_LAST_COLUMN = chr(ord('A') + len(EXPECTED_HEADERS) - 1)
+
+def _rows_range(first_row: int, last_row: Optional[int] = None) -> str:
+    """A1 range spanning every column of the given rows; open-ended without last_row"""
+    return f"A{first_row}:{_LAST_COLUMN}{last_row if last_row is not None else ''}"
+
+def _row_record(row_values: List[str], row_number: int) -> Dict[str, Any]:
+    """Expense dict for a row read by _read_row, keyed by the column headers"""
+    # The header row is checked against EXPECTED_HEADERS at startup, so it needn't be read back
+    record = dict(zip(EXPECTED_HEADERS, row_values, strict=True))
+    record['row_number'] = row_number
+    return record
+
+# Strftime patterns for the time-period breakdowns
+_PERIOD_FORMATS = {"day": '%Y-%m-%d', "week": '%Y-W%U', "month": '%Y-%m', "year": '%Y'}
+
+def _filter_mask(
+    df: pd.DataFrame,
+    user_id: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    category: Optional[str] = None
+) -> np.ndarray:
+    """Boolean mask of the sheet frame's rows for a user, date range and category"""
+    # Filter by user_id
+    mask = (df['User ID'] == user_id).to_numpy(copy=True)
+    
+    # Apply date filters
+    if start_date:
+        mask &= (df['Date'] >= pd.to_datetime(start_date)).to_numpy()
+    if end_date:
+        mask &= (df['Date'] <= pd.to_datetime(end_date)).to_numpy()
+    
+    # Apply category filter
+    if category:
+        mask &= (df['Category'].str.lower() == category.lower()).to_numpy()
+    
+    return mask
+
+# Low-cardinality columns held as pandas categoricals in the sheet frame
+_CATEGORICAL_COLUMNS = ['Currency', 'Category', 'User ID']
+# Free-text columns held as pandas strings, Arrow-backed when pyarrow is installed,
+# so they're stored contiguously and searched with Arrow's string kernels
+_TEXT_COLUMNS = ['Description', 'Subcategory', 'Tags', 'Notes']
+_TEXT_DTYPE = pd.StringDtype('pyarrow' if importlib.util.find_spec('pyarrow') else 'python')
+
+def _parse_rows(rows: List[List[str]], first_row: int) -> pd.DataFrame:
+    """Typed frame of sheet rows read as text, numbered from first_row, with the EXPECTED_HEADERS columns"""
+    if not rows:
+        return pd.DataFrame()
+    
+    # The API leaves out trailing empty cells, and returns blank rows as []
+    width = len(EXPECTED_HEADERS)
+    df = pd.DataFrame([row + [''] * (width - len(row)) for row in rows], columns=list(EXPECTED_HEADERS))
+    df['row_number'] = np.arange(first_row, first_row + len(df), dtype=np.int32)
+    # The app writes YYYY-MM-DD, which parses with a fixed format; only dates typed
+    # into the sheet by hand in another format go through format inference
+    dates = pd.to_datetime(df['Date'], format='%Y-%m-%d', errors='coerce')
+    unparsed = dates.isna() & (df['Date'] != '')
+    if unparsed.any():
+        dates[unparsed] = pd.to_datetime(df.loc[unparsed, 'Date'], errors='coerce')
+    df['Date'] = dates
+    # Always float, so a page of whole-number amounts types the same as the full sheet
+    df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce').astype(np.float64)
+    # Few distinct values, so filters and groupbys work on integer codes
+    return df.astype({
+        **{column: 'category' for column in _CATEGORICAL_COLUMNS},
+        **{column: _TEXT_DTYPE for column in _TEXT_COLUMNS}
+    })
+
 class GoogleSheetsService:
+    # Concurrent add_expense calls are coalesced into a single append request,
+    # flushed once this many rows are queued or after WRITE_MAX_DELAY seconds
+    WRITE_MAX_BATCH = 50
+    WRITE_MAX_DELAY = 0.025
+    # Large imports are appended in chunks of this many rows, with a few chunks in flight
+    IMPORT_CHUNK_SIZE = 500
+    IMPORT_CONCURRENCY = 5
+    # Rows fetched per range request when streaming expenses
+    STREAM_PAGE_SIZE = 500
+    # The access token is refreshed in the background this many seconds before it expires
+    TOKEN_REFRESH_MARGIN = 300
+    TOKEN_RETRY_DELAY = 30
+    TOKEN_DEFAULT_LIFETIME = 3600
+    # Seconds a full-sheet read is shared by later reads; local writes invalidate it sooner
+    FRAME_CACHE_TTL = 5.0
+
     def __init__(self):
-        print("Initializing Google Sheets Service...")
+        logger.info("Initializing Google Sheets Service...")
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        # (monotonic fetch time, sheet frame), the read in progress, and a counter bumped by writes
+        self._frame_cached: Optional[Tuple[float, pd.DataFrame]] = None
+        self._frame_task: Optional[asyncio.Task] = None
+        self._frame_version = 0
         self.scope = [
             "https://www.googleapis.com/auth/spreadsheets",
             "https://www.googleapis.com/auth/drive"
         ]
         
+        settings = get_settings()
+        
         try:
-            print(f"Loading credentials from: {settings.google_service_account_json}")
+            logger.info("Loading credentials from: %s", settings.google_service_account_json)
             self.credentials = Credentials.from_service_account_file(
                 settings.google_service_account_json, 
                 scopes=self.scope
             )
             
-            self.gc = gspread.authorize(self.credentials)
-            print(f"Opening Google Sheet with ID: {settings.google_sheet_id}")
+            # One pooled, keep-alive session reused by every Sheets call, retrying 429s and transient errors
+            self.gc = gspread.Client(
+                auth=self.credentials,
+                session=pooled_session(self.credentials),
+                http_client=RetryingHTTPClient
+            )
+            self.gc.set_timeout(GOOGLE_API_TIMEOUT)
+            logger.info("Opening Google Sheet with ID: %s", settings.google_sheet_id)
             self.sheet = self.gc.open_by_key(settings.google_sheet_id)
-            print(f"Sheet title: {self.sheet.title}")
+            logger.info("Sheet title: %s", self.sheet.title)
             
             self.worksheet = self._get_or_create_worksheet()
-            print(f"Using worksheet: {self.worksheet.title}")
+            logger.info("Using worksheet: %s", self.worksheet.title)
             
             self._setup_headers()
-            print("Google Sheets Service initialized successfully")
+            logger.info("Google Sheets Service initialized successfully")
             
         except Exception as e:
-            print(f"Error initializing Google Sheets Service: {e}")
+            logger.error("Error initializing Google Sheets Service: %s", e)
             raise
     
     def _get_or_create_worksheet(self):
         """Get or create the expenses worksheet"""
+        settings = get_settings()
+        
         try:
-            print(f"Looking for worksheet: {settings.worksheet_name}")
+            logger.debug("Looking for worksheet: %s", settings.worksheet_name)
             worksheet = self.sheet.worksheet(settings.worksheet_name)
-            print(f"Found existing worksheet: {worksheet.title}")
+            logger.debug("Found existing worksheet: %s", worksheet.title)
             return worksheet
         except gspread.WorksheetNotFound:
-            print(f"Worksheet '{settings.worksheet_name}' not found, creating new one...")
+            logger.info("Worksheet '%s' not found, creating new one...", settings.worksheet_name)
             worksheet = self.sheet.add_worksheet(
                 title=settings.worksheet_name, 
                 rows=1000, 
                 cols=15
             )
-            print(f"Created new worksheet: {worksheet.title}")
+            logger.info("Created new worksheet: %s", worksheet.title)
             return worksheet
     
     def _setup_headers(self):
-        """Setup headers if the worksheet is empty or headers are missing"""
+        """
+        Setup headers if the worksheet is empty, and check existing ones. Every read and write
+        maps columns by the EXPECTED_HEADERS order, so a sheet with other headers is refused.
+        """
+        current_headers = None
         try:
             all_values = self.worksheet.get_all_values()
             
             # Expected headers
-            expected_headers = [
-                'Timestamp', 'Date', 'Time', 'Amount', 'Currency', 
-                'Category', 'Subcategory', 'Description', 'Tags', 
-                'Location', 'Payment Method', 'Notes', 'User ID'
-            ]
+            expected_headers = list(EXPECTED_HEADERS)
             
             # Check if worksheet is empty or headers are missing/incorrect
             setup_needed = False
             
             if not all_values:
-                print("Worksheet is empty, setting up headers...")
+                logger.info("Worksheet is empty, setting up headers...")
                 setup_needed = True
             elif len(all_values) == 0:
-                print("No rows found, setting up headers...")
+                logger.info("No rows found, setting up headers...")
                 setup_needed = True
-            # elif not all_values[0] or all_values[0] != expected_headers:
-            #     print("Headers missing or incorrect, setting up headers...")
-            #     print(f"Current first row: {all_values[0] if all_values else 'None'}")
-            #     setup_needed = True
             else:
-                print("Headers already exist and are correct")
+                # Columns past the last expected one are never read, so they're ignored
+                current_headers = all_values[0][:len(expected_headers)]
                 
             if setup_needed:
                 # If there are existing values but headers are wrong, clear and start fresh
                 if all_values and all_values[0] != expected_headers:
-                    print("Clearing worksheet and adding correct headers...")
+                    logger.info("Clearing worksheet and adding correct headers...")
                     self.worksheet.clear()
                     
                 self.worksheet.append_row(expected_headers)
-                print(f"Headers set up successfully: {expected_headers}")
+                logger.info("Headers set up successfully: %s", expected_headers)
                 
         except Exception as e:
-            print(f"Error setting up headers: {e}")
+            logger.error("Error setting up headers: %s", e)
             # Fallback: try to add headers anyway
             try:
-                expected_headers = [
-                    'Timestamp', 'Date', 'Time', 'Amount', 'Currency', 
-                    'Category', 'Subcategory', 'Description', 'Tags', 
-                    'Location', 'Payment Method', 'Notes', 'User ID'
-                ]
+                expected_headers = list(EXPECTED_HEADERS)
                 self.worksheet.append_row(expected_headers)
-                print("Headers added as fallback")
+                logger.info("Headers added as fallback")
             except Exception as fallback_error:
-                print(f"Fallback header setup also failed: {fallback_error}")
+                logger.error("Fallback header setup also failed: %s", fallback_error)
                 raise
+        
+        if current_headers is not None and current_headers != list(EXPECTED_HEADERS):
+            logger.error("Unexpected worksheet headers: %s", current_headers)
+            raise ValueError(
+                f"Worksheet headers {current_headers} don't match the expected {list(EXPECTED_HEADERS)}"
+            )
+        logger.debug("Headers already exist and are correct")
     
-    async def add_expense(self, expense: ParsedExpense) -> int:
-        """Add a new expense to the sheet and return row number"""
-        # Format timestamp in a readable Singapore time format
-        # Remove timezone info for cleaner display in sheets since we know it's Singapore time
-        singapore_timestamp = expense.timestamp.replace(tzinfo=None)
-        singapore_date = expense.date
-        singapore_time = expense.time
-        
-        row_data = [
-            singapore_timestamp.strftime('%Y-%m-%d %H:%M:%S'),  # Readable format without timezone
-            singapore_date.strftime('%Y-%m-%d'),  # Date in YYYY-MM-DD format
-            singapore_time.strftime('%H:%M:%S'),  # Time in HH:MM:SS format
+    def _build_row(self, expense: ParsedExpense) -> List[Any]:
+        """Build the sheet row for an expense"""
+        # Timestamp, date and time are formatted field by field rather than with strftime,
+        # which is the slow part of building a row. The timestamp is written without
+        # timezone info for cleaner display in sheets since we know it's Singapore time.
+        ts = expense.timestamp
+        d = expense.date
+        t = expense.time
+        
+        return [
+            f"{ts.year:04d}-{ts.month:02d}-{ts.day:02d} {ts.hour:02d}:{ts.minute:02d}:{ts.second:02d}",
+            f"{d.year:04d}-{d.month:02d}-{d.day:02d}",  # Date in YYYY-MM-DD format
+            f"{t.hour:02d}:{t.minute:02d}:{t.second:02d}",  # Time in HH:MM:SS format
             expense.amount,
             expense.currency,
-            expense.category.value,
+            expense.category,
             expense.subcategory or '',
             expense.description,
-            ', '.join(expense.tags),
+            ', '.join(expense.tags) if expense.tags else '',
             expense.location or '',
             expense.payment_method or '',
             expense.notes or '',
             expense.user_id
         ]
+    
+    async def add_expense(self, expense: ParsedExpense) -> int:
+        """Add a new expense to the sheet and return row number"""
+        return (await self.add_expenses([expense]))[0]
+    
+    async def add_expenses(self, expenses: List[ParsedExpense]) -> List[int]:
+        """
+        Add several expenses and return their row numbers, in order. They are queued together,
+        so they go out in as few append requests as the batch size allows.
+        """
+        self._ensure_writer()
+        self._ensure_token_refresher()
+        
+        loop = asyncio.get_running_loop()
+        futures = []
+        for expense in expenses:
+            future = loop.create_future()
+            self._write_queue.put_nowait((expense, future))
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+    
+    def _ensure_writer(self):
+        """Start the background batch writer on the running event loop if needed"""
+        if (
+            self._writer_task is None
+            or self._writer_task.done()
+            or self._writer_task.get_loop() is not asyncio.get_running_loop()
+        ):
+            self._write_queue = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._write_loop())
+    
+    def _ensure_token_refresher(self):
+        """Start the background credential refresher on the running event loop if needed"""
+        if (
+            self._refresh_task is None
+            or self._refresh_task.done()
+            or self._refresh_task.get_loop() is not asyncio.get_running_loop()
+        ):
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+    
+    async def _refresh_loop(self):
+        """Refresh the service-account token ahead of expiry so requests never wait on it"""
+        while True:
+            try:
+                await asyncio.to_thread(self.credentials.refresh, GoogleAuthRequest())
+            except Exception as e:
+                logger.warning("Error refreshing Google credentials: %s", e)
+                await asyncio.sleep(self.TOKEN_RETRY_DELAY)
+                continue
+            
+            # google-auth keeps expiry as a naive UTC datetime
+            expiry = self.credentials.expiry
+            if expiry is not None:
+                lifetime = (expiry - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds()
+            else:
+                lifetime = self.TOKEN_DEFAULT_LIFETIME
+            await asyncio.sleep(max(lifetime - self.TOKEN_REFRESH_MARGIN, self.TOKEN_RETRY_DELAY))
+    
+    async def _write_loop(self):
+        """Collect queued expenses and append them to the sheet in batches"""
+        loop = asyncio.get_running_loop()
         
-        self.worksheet.append_row(row_data)
+        while True:
+            batch = [await self._write_queue.get()]
+            deadline = loop.time() + self.WRITE_MAX_DELAY
+            
+            while len(batch) < self.WRITE_MAX_BATCH:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._write_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            await self._flush_writes(batch)
+    
+    async def _flush_writes(self, batch: List[Tuple[ParsedExpense, asyncio.Future]]):
+        """Append a batch of expenses with one API call, in a worker thread, and resolve their row numbers"""
+        try:
+            rows = [self._build_row(expense) for expense, _ in batch]
+            first_row = await asyncio.to_thread(self._append_rows, rows)
+            
+        except Exception as e:
+            logger.error("Error appending %d expense(s): %s", len(batch), e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self._invalidate_frame()
+        for offset, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(first_row + offset)
+    
+    def _append_rows(self, rows: List[List[Any]]) -> int:
+        """Append rows with one API call and return the row number of the first"""
+        # Anchor on A1 so the table is always found from the header row, and insert
+        # fresh rows rather than overwriting any blank-looking ones below the table
+        response = self.worksheet.append_rows(rows, insert_data_option='INSERT_ROWS', table_range='A1')
+        
+        # The response carries the written range (e.g. "expenses!A57:M59"),
+        # so the first row number comes back without re-reading the sheet
+        updated_range = response['updates']['updatedRange']
+        return int(re.search(r'![A-Z]+(\d+)', updated_range).group(1))
+    
+    async def bulk_import(self, expenses: List[ParsedExpense]) -> List[int]:
+        """
+        Append a large set of expenses, e.g. a statement import, and return their row numbers
+        in order. Rows go out in IMPORT_CHUNK_SIZE chunks, IMPORT_CONCURRENCY at a time, each
+        in a worker thread; chunks may land in any order relative to each other.
+        """
+        self._ensure_token_refresher()
+        
+        rows = [self._build_row(expense) for expense in expenses]
+        chunks = [rows[start:start + self.IMPORT_CHUNK_SIZE] for start in range(0, len(rows), self.IMPORT_CHUNK_SIZE)]
+        limit = asyncio.Semaphore(self.IMPORT_CONCURRENCY)
+        
+        async def append(chunk: List[List[Any]]) -> List[int]:
+            async with limit:
+                first_row = await asyncio.to_thread(self._append_rows, chunk)
+            return list(range(first_row, first_row + len(chunk)))
         
-        # Get the row number of the newly added expense
-        all_records = self.worksheet.get_all_values()
-        return len(all_records)
+        try:
+            row_numbers = await asyncio.gather(*(append(chunk) for chunk in chunks))
+        finally:
+            # Even a partly failed import may have written some chunks
+            self._invalidate_frame()
+        return [row_number for chunk_rows in row_numbers for row_number in chunk_rows]
     
     async def get_expenses(
         self, 
@@ -143,57 +390,140 @@ class GoogleSheetsService:
         category: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """Get expenses with optional filtering"""
-        
-        # Get all records as dataframe
-        records = self.worksheet.get_all_records()
-        df = pd.DataFrame(records)
+        df = await self.get_expenses_frame(user_id, start_date, end_date, category)
         
         if df.empty:
             return []
         
-        # Add row numbers (starting from row 2 since row 1 is headers)
-        df['row_number'] = range(2, len(df) + 2)
-        
-        # Filter by user_id
-        df = df[df['User ID'] == user_id]
-        
-        # Convert date column to datetime for filtering
-        df['Date'] = pd.to_datetime(df['Date'])
-        
-        # Apply date filters
-        if start_date:
-            df = df[df['Date'] >= pd.to_datetime(start_date)]
-        if end_date:
-            df = df[df['Date'] <= pd.to_datetime(end_date)]
-        
-        # Apply category filter
-        if category:
-            df = df[df['Category'].str.lower() == category.lower()]
-        
         # Convert back to list of dictionaries
         return df.to_dict('records')
     
+    async def get_expenses_frame(
+        self,
+        user_id: str = "default_user",
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        category: Optional[str] = None
+    ) -> pd.DataFrame:
+        """Get expenses with optional filtering as a DataFrame, with Date parsed and Amount numeric"""
+        df = await self._get_sheet_frame()
+        
+        if df.empty:
+            return df
+        
+        # Selecting rows copies, leaving the shared frame untouched
+        return df[_filter_mask(df, user_id, start_date, end_date, category)]
+    
+    async def _get_sheet_frame(self) -> pd.DataFrame:
+        """
+        Every expense row as a DataFrame with row numbers, parsed dates and numeric amounts.
+        One read is shared by all callers for FRAME_CACHE_TTL seconds; treat it as read-only.
+        """
+        self._ensure_token_refresher()
+        
+        cached = self._frame_cached
+        if cached is not None and time.monotonic() - cached[0] < self.FRAME_CACHE_TTL:
+            return cached[1]
+        
+        # Concurrent callers wait on the same read
+        task = self._frame_task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.create_task(self._load_sheet_frame(self._frame_version))
+            self._frame_task = task
+        return await asyncio.shield(task)
+    
+    async def _load_sheet_frame(self, version: int) -> pd.DataFrame:
+        """Read and parse the whole sheet, off the event loop"""
+        fetched_at = time.monotonic()
+        # One range read of the displayed values, as get_all_records reads, but without gspread
+        # building a dict per row and guessing a type per cell; text columns stay text
+        # Row 1 holds the headers, checked at startup, so the read starts at row 2
+        values = await asyncio.to_thread(self.worksheet.get, _rows_range(2))
+        df = _parse_rows(values, 2)
+        
+        # A write made while this read was in flight may be missing from it, so don't keep it
+        if version == self._frame_version:
+            self._frame_cached = (fetched_at, df)
+        return df
+    
+    def _invalidate_frame(self):
+        """Drop the cached sheet frame after a write"""
+        self._frame_version += 1
+        self._frame_cached = None
+        self._frame_task = None
+    
+    def _read_row(self, row_number: int) -> List[str]:
+        """The given row's values, padded to the width of EXPECTED_HEADERS"""
+        values = self.worksheet.get(_rows_range(row_number, row_number))
+        # The API leaves out trailing empty cells, and returns a blank row as no values at all
+        row_values = values[0] if values else []
+        return row_values + [''] * (len(EXPECTED_HEADERS) - len(row_values))
+    
+    def _grid_row_count(self) -> int:
+        """The worksheet's row count, fetched fresh; the worksheet's own copy is from when it was opened"""
+        metadata = self.sheet.fetch_sheet_metadata({'fields': 'sheets.properties(sheetId,gridProperties.rowCount)'})
+        for sheet in metadata['sheets']:
+            if sheet['properties']['sheetId'] == self.worksheet.id:
+                return sheet['properties']['gridProperties']['rowCount']
+        raise gspread.WorksheetNotFound(self.worksheet.title)
+    
+    async def stream_expenses(
+        self,
+        user_id: str = "default_user",
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        category: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield matching expenses page by page, reading the sheet in fixed-size row ranges.
+        Each page is typed and filtered as the cached sheet frame is, so records match get_expenses.
+        """
+        self._ensure_token_refresher()
+        
+        # Sheets trims blank rows from a range, so neither a short nor an empty page marks the
+        # end of the data; page up to the grid's current row count instead
+        row_count = await asyncio.to_thread(self._grid_row_count)
+        # Row 1 holds the headers, checked at startup
+        start_row = 2
+        
+        while start_row <= row_count:
+            end_row = min(start_row + self.STREAM_PAGE_SIZE - 1, row_count)
+            page = await asyncio.to_thread(self.worksheet.get, _rows_range(start_row, end_row))
+            
+            df = _parse_rows(page, start_row)
+            if not df.empty:
+                for record in df[_filter_mask(df, user_id, start_date, end_date, category)].to_dict('records'):
+                    yield record
+            
+            start_row = end_row + 1
+    
     async def get_spending_by_category(
         self, 
         user_id: str = "default_user",
         start_date: Optional[date] = None,
         end_date: Optional[date] = None
-    ) -> Dict[str, float]:
-        """Get spending breakdown by category"""
+    ) -> Tuple[Dict[str, float], float]:
+        """Get spending breakdown by category and the overall total, from the matching rows' amounts"""
         
-        expenses = await self.get_expenses(user_id, start_date, end_date)
-        df = pd.DataFrame(expenses)
+        df = await self._get_sheet_frame()
         
         if df.empty:
-            return {}
-        
-        # Convert Amount to numeric
-        df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
-        
-        # Group by category and sum amounts
-        category_spending = df.groupby('Category')['Amount'].sum().to_dict()
-        
-        return category_spending
+            return {}, 0.0
+        
+        # Only the Amount and Category code arrays are selected, not whole rows;
+        # unparseable amounts are NaN and skipped
+        mask = _filter_mask(df, user_id, start_date, end_date)
+        amounts = df['Amount'].to_numpy()[mask]
+        codes = df['Category'].cat.codes.to_numpy()[mask]
+        spent = ~np.isnan(amounts) & (codes >= 0)
+        amounts, codes = amounts[spent], codes[spent]
+        
+        # Sum per category code in one pass, then label in order of first appearance
+        categories = df['Category'].cat.categories
+        sums = np.bincount(codes, weights=amounts, minlength=len(categories))
+        category_spending = {categories[code]: float(sums[code]) for code in pd.unique(codes)}
+        
+        return category_spending, float(amounts.sum())
     
     async def get_spending_by_time_period(
         self,
@@ -204,30 +534,25 @@ class GoogleSheetsService:
     ) -> Dict[str, float]:
         """Get spending breakdown by time period"""
         
-        expenses = await self.get_expenses(user_id, start_date, end_date)
-        df = pd.DataFrame(expenses)
+        df = await self._get_sheet_frame()
         
         if df.empty:
             return {}
         
-        # Convert columns to appropriate types
-        df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
-        df['Date'] = pd.to_datetime(df['Date'])
-        
-        # Group by time period
-        if period == "day":
-            df['Period'] = df['Date'].dt.strftime('%Y-%m-%d')
-        elif period == "week":
-            df['Period'] = df['Date'].dt.strftime('%Y-W%U')
-        elif period == "month":
-            df['Period'] = df['Date'].dt.strftime('%Y-%m')
-        elif period == "year":
-            df['Period'] = df['Date'].dt.strftime('%Y')
-        else:
+        mask = _filter_mask(df, user_id, start_date, end_date)
+        if not mask.any():
+            return {}
+        
+        date_format = _PERIOD_FORMATS.get(period)
+        if date_format is None:
             raise ValueError("Period must be one of: day, week, month, year")
         
-        # Group by period and sum amounts
-        period_spending = df.groupby('Period')['Amount'].sum().to_dict()
+        # Only the Date and Amount arrays are selected, not whole rows. Sum per day on the
+        # datetime keys first, then format only the distinct days, instead of building a
+        # string period for every row
+        amounts = pd.Series(df['Amount'].to_numpy()[mask], index=pd.DatetimeIndex(df['Date'].to_numpy()[mask]))
+        daily = amounts.groupby(level=0).sum()
+        period_spending = daily.groupby(daily.index.strftime(date_format)).sum().to_dict()
         
         return period_spending
     
@@ -239,17 +564,15 @@ class GoogleSheetsService:
     ) -> float:
         """Get total spending for a user in a date range"""
         
-        expenses = await self.get_expenses(user_id, start_date, end_date)
-        df = pd.DataFrame(expenses)
+        df = await self._get_sheet_frame()
         
         if df.empty:
             return 0.0
         
-        # Convert Amount to numeric and sum
-        df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
-        total = df['Amount'].sum()
+        # Sum just the matching amounts; unparseable amounts are NaN and skipped
+        amounts = df['Amount'].to_numpy()[_filter_mask(df, user_id, start_date, end_date)]
         
-        return float(total)
+        return float(np.nansum(amounts))
     
     async def search_expenses(
         self,
@@ -258,96 +581,139 @@ class GoogleSheetsService:
     ) -> List[Dict[str, Any]]:
         """Search expenses by description, category, or tags"""
         
-        expenses = await self.get_expenses(user_id)
-        df = pd.DataFrame(expenses)
+        df = await self.get_expenses_frame(user_id)
         
         if df.empty:
             return []
         
-        # Create a searchable text column
-        df['searchable'] = (
-            df['Description'].astype(str) + ' ' +
-            df['Category'].astype(str) + ' ' +
-            df['Subcategory'].astype(str) + ' ' +
-            df['Tags'].astype(str) + ' ' +
-            df['Notes'].astype(str)
+        # Searchable text built in one concatenation pass, kept out of the frame
+        searchable = df['Description'].astype(_TEXT_DTYPE).str.cat(
+            df[_SEARCH_COLUMNS].astype(_TEXT_DTYPE), sep=' '
         ).str.lower()
         
-        # Filter by query
-        mask = df['searchable'].str.contains(query.lower(), na=False)
-        filtered_df = df[mask]
+        # Filter by query as a plain substring, not a regex
+        mask = searchable.str.contains(query.lower(), regex=False, na=False)
         
-        # Remove the searchable column and return (keeping row_number)
-        filtered_df = filtered_df.drop('searchable', axis=1)
-        return filtered_df.to_dict('records')
+        # Return the matching rows (keeping row_number)
+        return df[mask].to_dict('records')
 
     async def update_expense(self, row_number: int, expense: ParsedExpense) -> bool:
         """Update an existing expense by row number"""
+        self._ensure_token_refresher()
+        
         try:
-            # Check if row exists
-            all_values = self.worksheet.get_all_values()
-            if row_number < 1 or row_number > len(all_values):
+            # Check the row holds an expense, reading just that row
+            if row_number <= 1 or not any(await asyncio.to_thread(self._read_row, row_number)):
                 return False
             
             # Prepare row data (same format as add_expense)
-            row_data = [
-                expense.timestamp.isoformat(),
-                expense.date.isoformat(),
-                expense.time.isoformat(),
-                expense.amount,
-                expense.currency,
-                expense.category.value,
-                expense.subcategory or '',
-                expense.description,
-                ', '.join(expense.tags),
-                expense.location or '',
-                expense.payment_method or '',
-                expense.notes or '',
-                expense.user_id
-            ]
+            row_data = self._build_row(expense)
             
             # Update the specific row (row_number is 1-based)
-            self.worksheet.update(f'A{row_number}:M{row_number}', [row_data])
+            await asyncio.to_thread(self.worksheet.update, _rows_range(row_number, row_number), [row_data])
+            self._invalidate_frame()
             return True
             
         except Exception as e:
-            print(f"Error updating expense at row {row_number}: {e}")
+            logger.error("Error updating expense at row %d: %s", row_number, e)
             return False
 
+    async def update_expense_if_exists(self, row_number: int, expense: ParsedExpense) -> Optional[Dict[str, Any]]:
+        """
+        Update an expense only if its row holds data, returning the previous values.
+        Only the target row is read before the write.
+        """
+        self._ensure_token_refresher()
+        
+        if row_number <= 1:
+            return None
+        
+        row_values = await asyncio.to_thread(self._read_row, row_number)
+        
+        if not any(row_values):
+            return None
+        
+        row_data = self._build_row(expense)
+        await asyncio.to_thread(self.worksheet.update, _rows_range(row_number, row_number), [row_data])
+        self._invalidate_frame()
+        
+        return _row_record(row_values, row_number)
+
     async def delete_expense(self, row_number: int) -> bool:
         """Delete an expense by row number"""
+        self._ensure_token_refresher()
+        
         try:
-            # Check if row exists and is not the header
-            all_values = self.worksheet.get_all_values()
-            if row_number <= 1 or row_number > len(all_values):
+            # Check the row holds an expense and is not the header, reading just that row
+            if row_number <= 1 or not any(await asyncio.to_thread(self._read_row, row_number)):
                 return False
             
             # Delete the specific row (row_number is 1-based)
-            self.worksheet.delete_rows(row_number)
+            await asyncio.to_thread(self.worksheet.delete_rows, row_number)
+            self._invalidate_frame()
             return True
             
         except Exception as e:
-            print(f"Error deleting expense at row {row_number}: {e}")
+            logger.error("Error deleting expense at row %d: %s", row_number, e)
             return False
 
+    async def update_expenses(self, updates: List[Tuple[int, ParsedExpense]]) -> None:
+        """
+        Overwrite several rows in one values batchUpdate request. Rows are not read first;
+        callers pass row numbers they got from the sheet.
+        """
+        self._ensure_token_refresher()
+        
+        if any(row_number <= 1 for row_number, _ in updates):
+            raise ValueError("Row numbers must be greater than 1 (row 1 holds the headers)")
+        if not updates:
+            return
+        
+        await asyncio.to_thread(self.worksheet.batch_update, [
+            {'range': _rows_range(row_number, row_number), 'values': [self._build_row(expense)]}
+            for row_number, expense in updates
+        ])
+        self._invalidate_frame()
+
+    async def delete_expenses(self, row_numbers: List[int]) -> None:
+        """
+        Delete several rows in one spreadsheet batchUpdate request. Rows are deleted from the
+        bottom up, so each request's row number still points at the intended row.
+        """
+        self._ensure_token_refresher()
+        
+        if any(row_number <= 1 for row_number in row_numbers):
+            raise ValueError("Row numbers must be greater than 1 (row 1 holds the headers)")
+        if not row_numbers:
+            return
+        
+        sheet_id = self.worksheet.id
+        await asyncio.to_thread(self.sheet.batch_update, {'requests': [
+            {'deleteDimension': {'range': {
+                'sheetId': sheet_id,
+                'dimension': 'ROWS',
+                'startIndex': row_number - 1,
+                'endIndex': row_number
+            }}}
+            for row_number in sorted(set(row_numbers), reverse=True)
+        ]})
+        self._invalidate_frame()
+
     async def get_expense_by_row(self, row_number: int) -> Optional[Dict[str, Any]]:
         """Get a specific expense by row number"""
+        self._ensure_token_refresher()
+        
         try:
-            # Check if row exists and is not the header
-            all_values = self.worksheet.get_all_values()
-            if row_number <= 1 or row_number > len(all_values):
+            # Check the row is not the header, then read just that row
+            if row_number <= 1:
                 return None
             
-            # Get headers and the specific row
-            headers = all_values[0]
-            row_data = all_values[row_number - 1]  # Convert to 0-based index
-            
-            # Create dictionary from headers and row data
-            expense_dict = dict(zip(headers, row_data))
-            expense_dict['row_number'] = row_number
+            row_data = await asyncio.to_thread(self._read_row, row_number)
+            if not any(row_data):
+                return None
             
-            return expense_dict
+            return _row_record(row_data, row_number)
             
         except Exception as e:
-            print(f"Error getting expense at row {row_number}: {e}")
+            logger.error("Error getting expense at row %d: %s", row_number, e)
             return None